@@ -0,0 +1,172 @@
+'''
+    In-place editing of archives.php.
+
+    New issue sections and article rows are spliced in at the offsets found by
+    archive_index; every other byte of the page is kept as is and all pending
+    insertions are written at once, atomically.
+'''
+import archive_index
+import atomic
+import util
+
+
+class ArchiveEditError(Exception):
+    pass
+
+
+class ArchiveEditor:
+    '''
+        Collects insertions into the archive page and applies them in a single write.
+
+        Attributes:
+            path = Location of the archive page
+            text = Page content when the editor was created
+            index = archive_index.ArchiveIndex of text
+    '''
+
+    def __init__(self, path='archives.php'):
+        self.path = path
+        self.text = archive_index.read_archive(path)
+        self.index = archive_index.ArchiveIndex.from_text(self.text)
+        # (offset, text) spliced into existing sections
+        self.insertions = []
+        # (volume, issue) -> [header, [row, ...]] of sections added by this editor
+        self.new_sections = {}
+        self.row_counts = {}
+        # archive_index.file_key of the rows inserted by this editor
+        self.files = set()
+
+    def has_file(self, volume, issue, filename):
+        '''Return True if the page or a pending row of volume and issue links to filename.'''
+        return (archive_index.file_key(volume, issue, filename) in self.files
+                or self.index.has_file(volume, issue, filename))
+
+    def has_section(self, volume, issue):
+        key = (int(volume), int(issue))
+        return key in self.new_sections or self.index.section(*key) is not None
+
+    def insert_section(self, header, volume, issue):
+        '''Add an empty section for volume and issue after the last section.'''
+        key = (int(volume), int(issue))
+        if self.has_section(*key):
+            raise ArchiveEditError(f"Section of Vol {volume} No. {issue} already exists.")
+        if self.index.last_section() is None:
+            raise ArchiveEditError(f"No section found in {self.path} to append to.")
+        self.new_sections[key] = [header, []]
+
+    def next_row_number(self, volume, issue):
+        '''Return number of the next row of volume and issue, counting pending rows.'''
+        key = (int(volume), int(issue))
+        return self.index.next_row_number(*key) + self.row_counts.get(key, 0)
+
+    def insert_row(self, volume, issue, row, filename=None):
+        '''Append html row (linking to filename) to the table of volume and issue.'''
+        key = (int(volume), int(issue))
+        if key in self.new_sections:
+            self.new_sections[key][1].append(row)
+        else:
+            section = self.index.section(*key)
+            if section is None:
+                raise ArchiveEditError(f"Section of Vol {volume} No. {issue} doesn't exist.")
+            if section.rows_end is None:
+                raise ArchiveEditError(f"Section of Vol {volume} No. {issue} has no table body.")
+            self.insertions.append((section.rows_end, row))
+        self.row_counts[key] = self.row_counts.get(key, 0) + 1
+        if filename is not None:
+            self.files.add(archive_index.file_key(volume, issue, filename))
+
+    @property
+    def pending(self):
+        return bool(self.insertions or self.new_sections)
+
+    def render(self):
+        '''Return page text with every pending insertion applied.'''
+        insertions = list(self.insertions)
+        if self.new_sections:
+            sections = ''.join('\n' + util.get_template(header, ''.join(rows))
+                               for header, rows in self.new_sections.values())
+            insertions.append((self.index.last_section().end, sections))
+
+        parts = []
+        position = 0
+        # sorted() is stable: rows for the same offset keep insertion order
+        for offset, text in sorted(insertions, key=lambda insertion: insertion[0]):
+            parts.append(self.text[position:offset])
+            parts.append(text)
+            position = offset
+        parts.append(self.text[position:])
+        return ''.join(parts)
+
+    def commit(self):
+        '''Write pending insertions to the page through a temp file and rename.'''
+        if not self.pending:
+            return
+
+        if archive_index.read_archive(self.path) != self.text:
+            raise ArchiveEditError(f"{self.path} changed since it was read.")
+
+        text = self.render()
+        atomic.write_atomic(self.path, text)
+
+        self.text = text
+        self.index = archive_index.ArchiveIndex.from_text(text)
+        self.insertions = []
+        self.new_sections = {}
+        self.row_counts = {}
+        self.files = set()
+
+
+class ArchiveSession:
+    '''
+        Unit of work over the archive page: the page is read and parsed once,
+        any number of articles are added and a single coalesced write happens
+        on commit. No file handle is held between the read and the write.
+
+        Usage:
+            with ArchiveSession('archives.php') as session:
+                for handler in handlers:
+                    session.add(handler)
+            # committed on exit, discarded if the block raised
+    '''
+
+    def __init__(self, path='archives.php'):
+        self.path = path
+        self.editor = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def open(self):
+        if self.editor is None:
+            self.editor = ArchiveEditor(self.path)
+        return self
+
+    def add(self, handler):
+        '''
+            Queue section (when missing) and row of a pdf.TableHandler.
+
+            @returns:
+                added (bool): False when the issue section of the page, or a row
+                queued by this session, already links to the article's file
+        '''
+        self.open()
+        if self.editor.has_file(handler.volume, handler.issue, handler.filename):
+            return False
+        handler.add_section(self.editor)
+        handler.add_article(self.editor)
+        return True
+
+    def commit(self):
+        '''Write every queued insertion at once.'''
+        if self.editor is not None:
+            self.editor.commit()
+
+    def rollback(self):
+        '''Discard every queued insertion.'''
+        self.editor = None
@@ -0,0 +1,244 @@
+'''
+    In-memory index of the issue sections and article rows of archives.php.
+
+    Offsets are character offsets into the page read with newline='' (see
+    read_archive), so they can be used to splice the page without touching
+    any other markup.
+'''
+import hashlib
+import html
+import json
+import os
+import re
+from typing import List, NamedTuple, Optional
+from urllib.parse import unquote
+
+import atomic
+
+INDEX_VERSION = 1
+
+SECTION_START = '<div class="col-lg-12">'
+BLOCKQUOTE = re.compile(r'<blockquote>(?P<header>.*?)</blockquote>', re.S)
+SECTION_END = re.compile(r'</details>(\s*<hr>\s*</div>)?', re.S)
+TBODY_END = '</tbody>'
+ROW = re.compile(r'<tr>(?P<cells>.*?)</tr>', re.S)
+CELL = re.compile(r'<td>(?P<content>.*?)</td>', re.S)
+HREF = re.compile(r'href="(?P<href>[^"]*)"')
+TAG = re.compile(r'<[^>]+>')
+HEADER_VOL_ISSUE = re.compile(r'Vol\.?\s*(?P<volume>\d+)\s*-?\s*No\.?\s*(?P<issue>\d+)')
+HEADER_YEAR = re.compile(r'(?P<year>\d{4})')
+
+
+class IndexedRow(NamedTuple):
+    number: Optional[int]
+    title: str
+    authors: str
+    pages: str
+    href: Optional[str]
+    filename: Optional[str]
+    start: int
+    end: int
+
+
+class IndexedSection(NamedTuple):
+    header: str
+    volume: Optional[int]
+    issue: Optional[int]
+    year: Optional[int]
+    start: int
+    end: int
+    # Offset of </tbody> of the section, where new rows are inserted
+    rows_end: Optional[int]
+    rows: List[IndexedRow]
+
+
+def read_archive(path):
+    '''Return text of the archive page without newline translation.'''
+    with open(path, encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def cell_text(content):
+    '''Return plain text of a table cell.'''
+    return ' '.join(html.unescape(TAG.sub('', content)).split())
+
+
+def parse_row(match, offset=0):
+    cells = [cell.group('content') for cell in CELL.finditer(match.group('cells'))]
+    if len(cells) < 4:
+        return None
+
+    number = cell_text(cells[0])
+    title, _, authors = cell_text(cells[1]).rpartition(' - ')
+    if not title:
+        title, authors = authors, ''
+    href = HREF.search(cells[3])
+    href = html.unescape(href.group('href')) if href else None
+    filename = unquote(href.rstrip('/').rsplit('/', 1)[-1]) if href else None
+
+    return IndexedRow(
+        number=int(number) if number.isdigit() else None,
+        title=title,
+        authors=authors,
+        pages=cell_text(cells[2]),
+        href=href,
+        filename=filename,
+        start=offset + match.start(),
+        end=offset + match.end(),
+    )
+
+
+def parse_archive(text):
+    '''
+        Parse every issue section of the archive page text.
+
+        @returns:
+            sections (list): IndexedSection in page order
+    '''
+    sections = []
+    position = 0
+
+    for blockquote in BLOCKQUOTE.finditer(text):
+        if blockquote.start() < position:
+            continue
+
+        header = cell_text(blockquote.group('header'))
+        vol_issue = HEADER_VOL_ISSUE.search(header)
+        year = HEADER_YEAR.search(header)
+
+        section_start = text.rfind(SECTION_START, position, blockquote.start())
+        if section_start == -1:
+            section_start = blockquote.start()
+
+        section_end = SECTION_END.search(text, blockquote.end())
+        end = section_end.end() if section_end else len(text)
+        details_end = section_end.start() if section_end else len(text)
+
+        body = text[blockquote.end():details_end]
+        rows_end = body.rfind(TBODY_END)
+        rows = [row for row in (parse_row(match, blockquote.end())
+                                for match in ROW.finditer(body)) if row]
+
+        sections.append(IndexedSection(
+            header=header,
+            volume=int(vol_issue.group('volume')) if vol_issue else None,
+            issue=int(vol_issue.group('issue')) if vol_issue else None,
+            year=int(year.group('year')) if year else None,
+            start=section_start,
+            end=end,
+            rows_end=blockquote.end() + rows_end if rows_end != -1 else None,
+            rows=rows,
+        ))
+        position = end
+
+    return sections
+
+
+class ArchiveIndex:
+    '''
+        Lookups over the sections of archives.php.
+
+        Attributes:
+            sections = IndexedSection list in page order
+            source_hash = sha256 of the page text the index was built from
+    '''
+
+    def __init__(self, sections, source_hash=None):
+        self.sections = sections
+        self.source_hash = source_hash
+        self.by_issue = {(s.volume, s.issue): s for s in sections if s.volume is not None}
+        # (volume, issue, filename) -> (section, row), the same basename is
+        # used by articles of different issues
+        self.by_file = {(section.volume, section.issue, row.filename): (section, row)
+                        for section in sections for row in section.rows if row.filename}
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(parse_archive(text), text_digest(text))
+
+    def section(self, volume, issue):
+        '''Return section of volume and issue or None.'''
+        return self.by_issue.get((int(volume), int(issue)))
+
+    def articles(self, volume, issue):
+        '''Return rows of volume and issue.'''
+        section = self.section(volume, issue)
+        return section.rows if section else []
+
+    def next_row_number(self, volume, issue):
+        '''Return number of the next row appended to volume and issue.'''
+        numbers = [row.number for row in self.articles(volume, issue) if row.number]
+        return max(numbers, default=0) + 1
+
+    def has_file(self, volume, issue, filename):
+        return file_key(volume, issue, filename) in self.by_file
+
+    def find_file(self, volume, issue, filename):
+        '''Return (section, row) of volume and issue linking to filename or None.'''
+        return self.by_file.get(file_key(volume, issue, filename))
+
+    def last_section(self):
+        return self.sections[-1] if self.sections else None
+
+    def to_json(self):
+        return json.dumps({
+            'version': INDEX_VERSION,
+            'source_hash': self.source_hash,
+            'sections': [dict(s._asdict(), rows=[list(row) for row in s.rows])
+                         for s in self.sections],
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {data.get('version')}.")
+        sections = [IndexedSection(**dict(s, rows=[IndexedRow(*row) for row in s['rows']]))
+                    for s in data['sections']]
+        return cls(sections, data['source_hash'])
+
+    def save(self, path):
+        atomic.write_atomic(path, self.to_json())
+
+
+def file_key(volume, issue, filename):
+    '''Return key of a row in ArchiveIndex.by_file, volume and issue are None in Special Editions.'''
+    if volume is None:
+        return None, None, filename
+    return int(volume), int(issue), filename
+
+
+def sidecar_path(archive_path):
+    return os.path.splitext(archive_path)[0] + '.index.json'
+
+
+def load_index(archive_path='archives.php', sidecar=None):
+    '''
+        Return index of archive_path, reusing the json sidecar when it was
+        built from the current page content and refreshing it otherwise.
+    '''
+    sidecar = sidecar or sidecar_path(archive_path)
+    text = read_archive(archive_path)
+    digest = text_digest(text)
+
+    try:
+        with open(sidecar, encoding='utf-8') as f:
+            index = ArchiveIndex.from_json(f.read())
+        if index.source_hash == digest:
+            return index
+    except (OSError, ValueError, TypeError, KeyError):
+        pass
+
+    index = ArchiveIndex(parse_archive(text), digest)
+    index.save(sidecar)
+    return index
+
+
+if __name__ == '__main__':
+    index = load_index()
+    for section in index.sections:
+        print(f"{section.header}: {len(section.rows)} articles")
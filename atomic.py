@@ -0,0 +1,27 @@
+'''
+    Atomic replacement of files written by the tools (archive page, store,
+    caches, indexes and state files).
+'''
+import os
+import tempfile
+
+
+def write_atomic(path, text):
+    '''
+        Write text to path through a unique temp file in the same directory
+        and rename, readers see the old or the new content, never a part.
+
+        The temp file is removed when writing fails and the mode of an
+        existing file is kept.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
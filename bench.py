@@ -0,0 +1,478 @@
+'''
+    Benchmarks for the ingestion tools.
+
+    Usage:
+        python bench.py ingest ./test_files --workers 1 2 4 8
+        python bench.py cache ./test_files
+        python bench.py pdfxml ./test_files
+        python bench.py textblocks --fonts 10 100 400
+        python bench.py stages ./test_files
+        python bench.py metadata
+        python bench.py links archives.php
+        python bench.py render archives.php
+        python bench.py formatters archives.php
+        python bench.py suite --sizes 10 100 500 [--save-baseline]
+'''
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+
+def timed(fun, *args, **kwargs):
+    '''Return (seconds, result) of calling fun.'''
+    start = time.perf_counter()
+    result = fun(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def traced(fun, *args, **kwargs):
+    '''Return (seconds, peak traced memory in bytes, result) of calling fun.'''
+    tracemalloc.start()
+    try:
+        seconds, result = timed(fun, *args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak, result
+
+
+def print_table(header, rows):
+    '''Print rows as a plain left aligned table.'''
+    widths = [max(len(str(row[i])) for row in [header] + rows)
+              for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(str(cell).ljust(width)
+                        for cell, width in zip(row, widths)))
+
+
+def bench_ingest(directory, workers):
+    '''
+        Compare the serial TableHandler(Article(path)) loop against pdf.ingest.
+
+        @args:
+            directory: Directory holding the pdf files
+            workers: Worker counts to be measured
+    '''
+    import pdf
+    import util
+
+    util.config_tika()
+    files = [os.path.join(directory, i)
+             for i in os.listdir(directory) if i.endswith('.pdf')]
+
+    def serial():
+        done = 0
+        for path in files:
+            try:
+                pdf.article_fields(pdf.Article(path))
+                done += 1
+            except Exception:
+                pass
+        return done
+
+    def pooled(count):
+        return sum(1 for _, fields, _ in pdf.ingest(files, workers=count) if fields)
+
+    base, done = timed(serial)
+    rows = [['serial', len(files), done, f'{base:.2f}', '1.00']]
+    for count in workers:
+        seconds, done = timed(pooled, count)
+        rows.append([f'ingest x{count}', len(files), done,
+                     f'{seconds:.2f}', f'{base / seconds:.2f}'])
+    print_table(['mode', 'files', 'ok', 'seconds', 'speedup'], rows)
+
+
+def bench_cache(directory, workers=1):
+    '''Time a cold run (empty metadata cache) against a warm re-run over directory.'''
+    import cache
+    import pdf
+    import util
+
+    util.config_tika()
+    files = [os.path.join(directory, i)
+             for i in os.listdir(directory) if i.endswith('.pdf')]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        metadata_cache = cache.MetadataCache(cache_dir)
+        rows = []
+        for label in ('cold', 'warm'):
+            seconds, _ = timed(lambda: list(pdf.ingest(
+                files, workers=workers, metadata_cache=metadata_cache)))
+            rows.append([label, len(files), f'{seconds:.2f}'])
+    print_table(['run', 'files', 'seconds'], rows)
+
+
+def bench_pdfxml(directory):
+    '''Compare per pdf latency and peak memory of the BeautifulSoup round-trip
+    against the streaming pdftohtml XML parser.'''
+    import pdftitle
+
+    files = sorted(os.path.join(directory, i)
+                   for i in os.listdir(directory) if i.endswith('.pdf'))
+    paths = {
+        'soup': pdftitle.convert_pdf_to_xml_lenient,
+        'stream': pdftitle.convert_pdf_to_xml,
+    }
+
+    rows = []
+    for label, convert in paths.items():
+        total, peak = 0.0, 0
+        for path in files:
+            seconds, file_peak, _ = traced(convert, path)
+            total += seconds
+            peak = max(peak, file_peak)
+        per_file = total / len(files) * 1000 if files else 0
+        rows.append([label, len(files), f'{per_file:.1f}', f'{peak / 1024:.0f}'])
+    print_table(['path', 'files', 'ms/pdf', 'peak KiB'], rows)
+
+
+def synthetic_page(fonts, lines):
+    '''Return pdftohtml like XML of one page with lines spread over fonts.'''
+    import xml.etree.ElementTree as etree
+
+    root = etree.Element('pdf2xml')
+    page = etree.SubElement(root, 'page', number='1', top='0', height='1263')
+    for font_id in range(fonts):
+        etree.SubElement(page, 'fontspec', id=str(font_id), size=str(8 + font_id % 30))
+    for line in range(lines):
+        text = etree.SubElement(page, 'text', top=str(20 + line), left='50', width='300',
+                                height='12', font=str(line % fonts))
+        text.text = f'line {line} of the synthetic page'
+    return etree.ElementTree(root)
+
+
+def bench_textblocks(fonts, lines, repeat=5):
+    '''Compare per font XPath scans against the one pass first page index.'''
+    import pdftitle
+
+    rows = []
+    for count in fonts:
+        xml_data = synthetic_page(count, lines)
+        font_ids = pdftitle.sorted_font_ids(pdftitle.font_specs(xml_data))
+
+        def scans():
+            return [pdftitle.textblocks_by_id(xml_data, font_id) for font_id in font_ids]
+
+        def indexed():
+            return pdftitle.textblocks_by_font(xml_data, font_ids)
+
+        assert scans() == indexed()
+        scan_time = min(timed(scans)[0] for _ in range(repeat))
+        index_time = min(timed(indexed)[0] for _ in range(repeat))
+        rows.append([count, lines, f'{scan_time * 1000:.2f}', f'{index_time * 1000:.2f}',
+                     f'{scan_time / index_time:.1f}'])
+    print_table(['fonts', 'lines', 'scan ms', 'index ms', 'speedup'], rows)
+
+
+def bench_stages(directory):
+    '''Report time spent in every pdftitle pipeline stage over directory.'''
+    import pdftitle
+
+    totals = {}
+
+    def hook(stage, seconds):
+        totals[stage] = totals.get(stage, 0.0) + seconds
+
+    pipeline = pdftitle.Pipeline(pdftitle.CONFIG(filename=None), hook=hook)
+    files = sorted(os.path.join(directory, i)
+                   for i in os.listdir(directory) if i.endswith('.pdf'))
+    for path in files:
+        pdftitle.extract_title(path, pipeline=pipeline)
+
+    rows = [[stage, f'{seconds * 1000:.2f}']
+            for stage, seconds in sorted(totals.items(), key=lambda x: x[1], reverse=True)]
+    print_table(['stage', 'ms'], rows)
+
+
+def bench_metadata(fixtures='fixtures/first_pages.json', repeat=2000):
+    '''Measure throughput and per field accuracy of metadata.extract_metadata
+    over the first page fixtures, with and without the header window.'''
+    import metadata
+
+    with open(fixtures, encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    rows = []
+    for label, window in (('header window', metadata.HEADER_WINDOW), ('full text', None)):
+        seconds, _ = timed(lambda: [metadata.extract_metadata(entry['text'], window)
+                                    for _ in range(repeat) for entry in corpus])
+        correct = dict.fromkeys(metadata.ArticleMetadata._fields, 0)
+        for entry in corpus:
+            found = metadata.extract_metadata(entry['text'], window)._asdict()
+            for field in correct:
+                correct[field] += found[field] == entry['expected'][field]
+        rows.append([label, f'{repeat * len(corpus) / seconds:.0f}'] +
+                    [f'{correct[field]}/{len(corpus)}' for field in correct])
+    print_table(['mode', 'texts/s'] + list(metadata.ArticleMetadata._fields), rows)
+
+
+def bench_links(page_path, chunk_size=1 << 14):
+    '''Compare time to first link, total time and peak traced memory of the
+    soup based extraction against the streaming LinkExtractor over a page.'''
+    import bs4
+    import link_tester
+
+    with open(page_path, 'rb') as f:
+        page = f.read()
+    chunks = [page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+
+    def soup():
+        return link_tester.fetch_pdf_links(bs4.BeautifulSoup(page, 'lxml'))
+
+    def stream():
+        return link_tester.iter_pdf_links(chunks)
+
+    rows = []
+    for label, links in (('soup', soup), ('stream', stream)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        first = None
+        count = 0
+        for _ in links():
+            if first is None:
+                first = time.perf_counter() - start
+            count += 1
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append([label, count, f'{(first or 0) * 1000:.2f}',
+                     f'{total * 1000:.2f}', f'{peak / 1024:.0f}'])
+    print_table(['extractor', 'links', 'first ms', 'total ms', 'peak KiB'], rows)
+
+    # The page starts with a <?php ?> processing instruction outside <html>,
+    # the streaming extractor has to prune around it and find the same links
+    if list(soup()) != list(stream()):
+        raise Exception(f"Streaming extractor links differ from the soup ones on {page_path}.")
+
+
+def bench_render(page_path, repeat=20):
+    '''Time regenerating the listing of every volume and issue of the archive
+    page, joined in memory per issue (as build.py does) and streamed with
+    templates.write_archive.'''
+    import archive_index
+    import templates
+
+    index = archive_index.ArchiveIndex.from_text(archive_index.read_archive(page_path))
+    issues = [(section.header, [templates.row_values(row.number, row.title, row.authors,
+                                                     row.pages, row.href or '')
+                                for row in section.rows])
+              for section in index.sections]
+
+    def joined():
+        return '\n'.join(templates.render_issue(header, rows) for header, rows in issues) + '\n'
+
+    def streamed():
+        out = io.StringIO()
+        templates.write_archive(out, issues)
+        return out.getvalue()
+
+    if joined() != streamed():
+        raise Exception("templates.render_issue and templates.write_archive render differently.")
+    rows = []
+    for label, render in (('templates.render_issue', joined), ('templates.write_archive', streamed)):
+        seconds = min(timed(render)[0] for _ in range(repeat))
+        rows.append([label, len(issues), sum(len(r) for _, r in issues),
+                     f'{seconds * 1000:.2f}', len(render())])
+    print_table(['renderer', 'issues', 'rows', 'ms', 'chars'], rows)
+
+
+def bench_formatters(page_path, repeat=5):
+    '''Compare formatting every title with transduce(FORMATTERS) against
+    pdftitle.format_titles, over the titles of the archive page in the
+    shapes pdftohtml produces (as is, upper case, spaced out, ligatures,
+    doubled quotes).'''
+    import archive_index
+    import pdftitle
+
+    index = archive_index.ArchiveIndex.from_text(archive_index.read_archive(page_path))
+    titles = []
+    for section in index.sections:
+        for row in section.rows:
+            title = row.title
+            titles += [title, title.upper() + '.', ' '.join(title[:40]),
+                       title.replace('fi', '\ufb01').replace(' ', '\n', 2),
+                       f'\u2018\u2018{title}\u2019\u2019 *']
+    titles = [title.encode('utf-8') for title in titles if title] + [None, b'']
+
+    config = pdftitle.CONFIG(filename=None)
+
+    def per_title():
+        return [pdftitle.transduce(pdftitle.FORMATTERS, title, config) for title in titles]
+
+    def batch():
+        return pdftitle.format_titles(titles, config)
+
+    if per_title() != batch():
+        raise Exception("format_titles differs from transduce(FORMATTERS) on the archive titles.")
+    rows = []
+    for label, fun in (('per title', per_title), ('format_titles', batch)):
+        seconds = min(timed(fun)[0] for _ in range(repeat))
+        rows.append([label, len(titles), f'{seconds * 1000:.2f}', f'{len(titles) / seconds:.0f}'])
+    print_table(['formatter', 'titles', 'ms', 'titles/s'], rows)
+
+
+BASELINE_PATH = 'bench_baseline.json'
+
+
+def suite_stages(entries):
+    '''Return {stage: function} timed by bench_suite over corpus entries.'''
+    import pdf
+    import pdftitle
+
+    articles = [pdf.Article.from_text(entry.path, entry.text, entry.xml_data) for entry in entries]
+    handlers = [pdf.TableHandler(pdf.article_fields(article)) for article in articles]
+
+    def fields():
+        return [pdf.article_fields(pdf.Article.from_text(entry.path, entry.text, entry.xml_data))
+                for entry in entries]
+
+    def metadata_fields():
+        # Fresh articles, the metadata is memoized per article
+        return [(article.get_vol_issue(), article.get_pages(), article.get_authors())
+                for article in (pdf.Article.from_text(entry.path, entry.text) for entry in entries)]
+
+    stages = {
+        'extract_title (xml)': lambda: [pdftitle.extract_title(entry.path, xml_data=entry.xml_data)
+                                        for entry in entries],
+        'metadata fields': metadata_fields,
+        'article_fields': fields,
+        'TableHandler rows': lambda: [handler.generate_header() + handler.generate_row(number)
+                                      for number, handler in enumerate(handlers, 1)],
+    }
+    if shutil.which('pdftohtml'):
+        stages['extract_title (pdftohtml)'] = lambda: [pdftitle.extract_title(entry.path)
+                                                       for entry in entries]
+    return stages
+
+
+def suite_accuracy(entries):
+    '''Return the number of entries whose article_fields match the generated fields.'''
+    import pdf
+
+    correct = 0
+    for entry in entries:
+        fields = pdf.article_fields(pdf.Article.from_text(entry.path, entry.text, entry.xml_data))
+        article = entry.article
+        correct += (fields['title'].lower() == article.title.lower() and
+                    (fields['volume'], fields['issue']) == (str(article.volume), str(article.issue)) and
+                    fields['page_range'] == article.pages)
+    return correct
+
+
+def bench_suite(sizes, baseline=BASELINE_PATH, save=False, repeat=3, tolerance=1.25):
+    '''
+        Time title extraction, the Article field extractors and TableHandler
+        rendering over synthetic corpora (see corpus.py) of every size, per
+        article, and compare with the recorded baseline.
+
+        @args:
+            save: Record the results as the new baseline
+            tolerance: Slowdown against the baseline reported as a regression
+    '''
+    import corpus
+
+    results = {}
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            entries = corpus.write_corpus(os.path.join(directory, str(size)), size)
+            print(f'{size} articles: {suite_accuracy(entries)}/{size} extracted correctly')
+            # Small corpora are repeated more to even out the noise
+            rounds = max(repeat, 1000 // size)
+            for stage, fun in suite_stages(entries).items():
+                seconds = min(timed(fun)[0] for _ in range(rounds))
+                results.setdefault(stage, {})[str(size)] = seconds / size * 1000
+
+    recorded = {}
+    if os.path.exists(baseline):
+        with open(baseline) as f:
+            recorded = json.load(f)['results']
+
+    for stage, by_size in results.items():
+        for size, ms in by_size.items():
+            previous = recorded.get(stage, {}).get(size)
+            ratio = ms / previous if previous else None
+            rows.append([stage, size, f'{ms:.3f}',
+                         f'{previous:.3f}' if previous else '-',
+                         f'{ratio:.2f}' if ratio else '-',
+                         'REGRESSION' if ratio and ratio > tolerance else ''])
+    print_table(['stage', 'articles', 'ms/article', 'baseline', 'ratio', ''], rows)
+
+    if save:
+        with open(baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {baseline}')
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help='serial loop vs process pool')
+    ingest_parser.add_argument('directory', nargs='?', default='./test_files')
+    ingest_parser.add_argument('-w', '--workers', type=int, nargs='+', default=[2, 4])
+
+    cache_parser = commands.add_parser('cache', help='cold vs warm metadata cache')
+    cache_parser.add_argument('directory', nargs='?', default='./test_files')
+    cache_parser.add_argument('-w', '--workers', type=int, default=1)
+
+    pdfxml_parser = commands.add_parser('pdfxml', help='soup round-trip vs streaming xml')
+    pdfxml_parser.add_argument('directory', nargs='?', default='./test_files')
+
+    textblocks_parser = commands.add_parser('textblocks', help='per font scans vs page index')
+    textblocks_parser.add_argument('--fonts', type=int, nargs='+', default=[10, 100, 400])
+    textblocks_parser.add_argument('--lines', type=int, default=2000)
+
+    stages_parser = commands.add_parser('stages', help='time per pdftitle pipeline stage')
+    stages_parser.add_argument('directory', nargs='?', default='./test_files')
+
+    metadata_parser = commands.add_parser('metadata', help='metadata extraction throughput and accuracy')
+    metadata_parser.add_argument('--fixtures', default='fixtures/first_pages.json')
+
+    links_parser = commands.add_parser('links', help='soup vs streaming pdf link extraction')
+    links_parser.add_argument('page', nargs='?', default='archives.php')
+
+    render_parser = commands.add_parser('render', help='regenerate the whole archive listing')
+    render_parser.add_argument('page', nargs='?', default='archives.php')
+
+    formatters_parser = commands.add_parser('formatters', help='per title vs batch title formatting')
+    formatters_parser.add_argument('page', nargs='?', default='archives.php')
+
+    suite_parser = commands.add_parser('suite', help='synthetic corpus suite compared with a baseline')
+    suite_parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500])
+    suite_parser.add_argument('--baseline', default=BASELINE_PATH)
+    suite_parser.add_argument('--save-baseline', action='store_true')
+    suite_parser.add_argument('--tolerance', type=float, default=1.25,
+                              help='slowdown against the baseline reported as a regression')
+
+    args = arg_parser.parse_args()
+
+    if args.command == 'ingest':
+        bench_ingest(args.directory, args.workers)
+    elif args.command == 'cache':
+        bench_cache(args.directory, args.workers)
+    elif args.command == 'pdfxml':
+        bench_pdfxml(args.directory)
+    elif args.command == 'textblocks':
+        bench_textblocks(args.fonts, args.lines)
+    elif args.command == 'stages':
+        bench_stages(args.directory)
+    elif args.command == 'metadata':
+        bench_metadata(args.fixtures)
+    elif args.command == 'links':
+        bench_links(args.page)
+    elif args.command == 'render':
+        bench_render(args.page)
+    elif args.command == 'formatters':
+        bench_formatters(args.page)
+    elif args.command == 'suite':
+        bench_suite(args.sizes, args.baseline, args.save_baseline, tolerance=args.tolerance)
@@ -0,0 +1,205 @@
+'''
+    Regenerate archives.php from the article metadata store.
+
+    Usage:
+        python build.py seed      # create the store from the current archives.php
+        python build.py build     # re-render archives.php from the store
+
+    The store (articles.json) is a list of article records:
+        {"section": "Vol 5 - No. 2 (April - June, 2019)", "volume": 5, "issue": 2,
+         "year": 2019, "number": 1, "title": "...", "authors": "...",
+         "pages": "227-239", "href": "http://...pdf", "filename": "...pdf"}
+
+    Records belong to the section of their (volume, issue), volume-less
+    sections (eg. Special Editions) are told apart by their header. Sections
+    are rendered in order of their first record with the header of that
+    record, and rows by number.
+    Rendered sections are cached by a hash of their records, so a build only
+    re-renders the issues whose records changed.
+'''
+import argparse
+import hashlib
+import json
+
+import archive_index
+import atomic
+import templates
+
+STORE_PATH = 'articles.json'
+BUILD_CACHE_PATH = '.build_cache.json'
+# Bump when templates change so that every section is rendered again
+BUILD_VERSION = 1
+SECTION_SEPARATOR = '\n        '
+
+
+def load_json(path, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def load_store(path=STORE_PATH):
+    return load_json(path, [])
+
+
+def save_store(records, path=STORE_PATH):
+    atomic.write_atomic(path, json.dumps(records, indent=1, ensure_ascii=False) + '\n')
+
+
+def records_from_index(index):
+    '''Return store records of every row of an archive_index.ArchiveIndex.'''
+    return [{
+        'section': section.header,
+        'volume': section.volume,
+        'issue': section.issue,
+        'year': section.year,
+        'number': row.number,
+        'title': row.title,
+        'authors': row.authors,
+        'pages': row.pages,
+        'href': row.href,
+        'filename': row.filename,
+    } for section in index.sections for row in section.rows]
+
+
+def section_key(record):
+    '''Return (volume, issue) of record, or its header for sections without a volume.'''
+    if record['volume'] is None:
+        return record['section']
+    return record['volume'], record['issue']
+
+
+def add_records(new_records, path=STORE_PATH):
+    '''
+        Add records to the store skipping filenames already present and
+        numbering them after the last row of their section.
+
+        Records of a section already in the store take its header, so that
+        a header worded differently doesn't start a second section.
+
+        @returns:
+            added (list): Records that were added
+    '''
+    records = load_store(path)
+    filenames = {record['filename'] for record in records}
+    numbers = {}
+    headers = {}
+    for record in records:
+        key = section_key(record)
+        numbers[key] = max(numbers.get(key, 0), record['number'] or 0)
+        headers.setdefault(key, record['section'])
+
+    added = []
+    for record in new_records:
+        if record['filename'] in filenames:
+            continue
+        key = section_key(record)
+        numbers[key] = numbers.get(key, 0) + 1
+        record = dict(record, section=headers.setdefault(key, record['section']), number=numbers[key])
+        filenames.add(record['filename'])
+        records.append(record)
+        added.append(record)
+
+    if added:
+        save_store(records, path)
+    return added
+
+
+def group_sections(records):
+    '''
+        Return {section header: [records sorted by number]} in order of first
+        appearance, records are grouped by section_key under the header of
+        the first one.
+    '''
+    sections = {}
+    for record in records:
+        sections.setdefault(section_key(record), []).append(record)
+    for rows in sections.values():
+        rows.sort(key=lambda record: record['number'] or 0)
+    return {rows[0]['section']: rows for rows in sections.values()}
+
+
+def section_hash(header, rows):
+    data = json.dumps([BUILD_VERSION, header, rows], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def render_section(header, rows):
+    return templates.render_issue(header, (templates.row_values(
+        row['number'], row['title'], row['authors'], row['pages'], row['href'] or '')
+        for row in rows))
+
+
+def build(archive_path='archives.php', store_path=STORE_PATH, cache_path=BUILD_CACHE_PATH, force=False):
+    '''
+        Regenerate the sections of archive_path from the store, keeping the
+        page markup before the first and after the last section.
+
+        @args:
+            force: Write the page even if it has fewer sections or rows than before
+
+        @returns:
+            (rendered, reused): Number of sections rendered and reused from the cache
+    '''
+    records = load_json(store_path, None)
+    if records is None:
+        raise Exception(f"{store_path} not found, create it with: python build.py seed")
+    if not records:
+        raise Exception(f"{store_path} has no article, refusing to empty {archive_path}.")
+
+    text = archive_index.read_archive(archive_path)
+    sections = archive_index.parse_archive(text)
+    if not sections:
+        raise Exception(f"No section found in {archive_path} to replace.")
+    prefix, suffix = text[:sections[0].start], text[sections[-1].end:]
+
+    grouped = group_sections(records)
+    page_rows = sum(len(section.rows) for section in sections)
+    if not force and (len(grouped) < len(sections) or len(records) < page_rows):
+        raise Exception(
+            f"{store_path} has {len(grouped)} sections and {len(records)} rows but {archive_path} "
+            f"has {len(sections)} sections and {page_rows} rows, use --force to write it anyway.")
+
+    cache = load_json(cache_path, {})
+    new_cache = {}
+    rendered = reused = 0
+    fragments = []
+
+    for header, rows in grouped.items():
+        digest = section_hash(header, rows)
+        if digest in cache:
+            fragment = cache[digest]
+            reused += 1
+        else:
+            fragment = render_section(header, rows)
+            rendered += 1
+        new_cache[digest] = fragment
+        fragments.append(fragment)
+
+    page = prefix + SECTION_SEPARATOR.join(fragments) + suffix
+    if page != text:
+        atomic.write_atomic(archive_path, page)
+    atomic.write_atomic(cache_path, json.dumps(new_cache, ensure_ascii=False))
+    return rendered, reused
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Regenerate archives.php from articles.json.')
+    arg_parser.add_argument('command', choices=['seed', 'build'])
+    arg_parser.add_argument('--archive', default='archives.php')
+    arg_parser.add_argument('--store', default=STORE_PATH)
+    arg_parser.add_argument('--cache', default=BUILD_CACHE_PATH)
+    arg_parser.add_argument('--force', action='store_true',
+                            help='Build even if sections or rows of the page would be lost')
+    args = arg_parser.parse_args()
+
+    if args.command == 'seed':
+        index = archive_index.ArchiveIndex.from_text(archive_index.read_archive(args.archive))
+        records = records_from_index(index)
+        save_store(records, args.store)
+        print(f"{len(records)} articles written to {args.store}")
+    else:
+        rendered, reused = build(args.archive, args.store, args.cache, args.force)
+        print(f"{rendered} sections rendered, {reused} reused")
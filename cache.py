@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+
+import atomic
+
+# Bump whenever the extraction rules (Tika text handling, pdftitle filters or
+# the regexes in metadata.py) change so that stale entries are ignored.
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = '.gjms_cache'
+
+
+def file_digest(path, chunk_size=1 << 20):
+    '''Return sha256 hex digest of the file content at path.'''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MetadataCache:
+    '''
+        Persistent on-disk cache of extracted article fields keyed by the
+        content hash of the pdf file.
+
+        Every entry is stored as a json file: <directory>/<digest[:2]>/<digest>.json
+
+        Attributes:
+            directory = Location of the cache
+            version = Entries written with another version are treated as misses
+    '''
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, version=CACHE_VERSION):
+        self.directory = directory
+        self.version = version
+
+    def _entry_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + '.json')
+
+    def get(self, digest):
+        '''Return cached entry for digest or None on a miss.'''
+        try:
+            with open(self._entry_path(digest), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('version') != self.version:
+            return None
+        return entry['fields']
+
+    def put(self, digest, fields):
+        '''Store fields for digest, written atomically.'''
+        path = self._entry_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic.write_atomic(path, json.dumps({'version': self.version, 'fields': fields}))
@@ -0,0 +1,209 @@
+'''
+    Synthetic journal style first pages for the benchmarks, generated offline.
+
+    Every article is a one page PDF written by hand (Helvetica text, no
+    library or external tool needed) with a masthead, a "Vol X (Y)" or
+    "Vol. X, No.Y" line (both forms of metadata.VOL_ISSUE_PATTERNS) with
+    "pp. a-b", a title, the authors and an "ABSTRACT" marker. Along
+    with the PDF the XML pdftohtml -xml produces for the page and the plain
+    text Tika returns are generated, so title and metadata extraction can be
+    timed on machines without poppler or Tika and checked against the
+    generated fields.
+'''
+import os
+import random
+import xml.etree.ElementTree as etree
+from typing import List, NamedTuple
+
+MASTHEAD = 'Global Journal of Management, Social Sciences and Humanities'
+ISSN = 'ISSN 2520-7113 (Print) ISSN 2520-0739 (Online)'
+ISSUE_MONTHS = {1: 'Jan-Mar', 2: 'April-June', 3: 'July-Sept', 4: 'Oct-Dec'}
+START_YEAR = 2015
+
+# A4 in points, pdftohtml scales positions by 1.5
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+XML_ZOOM = 1.5
+
+TITLE_WORDS = (
+    'impact', 'analysis', 'role', 'performance', 'banking', 'sector', 'employees',
+    'leadership', 'financial', 'development', 'education', 'students', 'teachers',
+    'corporate', 'governance', 'marketing', 'consumer', 'behaviour', 'economic',
+    'growth', 'inflation', 'investment', 'motivation', 'organizational', 'culture',
+    'stock', 'market', 'returns', 'rural', 'women', 'microfinance', 'poverty',
+)
+TITLE_JOINERS = ('of', 'on', 'in', 'and', 'the', 'with', 'among')
+FIRST_NAMES = ('Allah', 'Mehreen', 'Muhammad', 'Ayesha', 'Sana', 'Imran', 'Rabia', 'Usman')
+LAST_NAMES = ('Nawaz', 'Riaz', 'Iqbal', 'Akhtar', 'Shahid', 'Khan', 'Bibi', 'Tariq')
+BODY_WORDS = TITLE_WORDS + TITLE_JOINERS + ('study', 'data', 'results', 'method', 'sample')
+
+
+class SyntheticArticle(NamedTuple):
+    filename: str
+    title: str
+    authors: List[str]
+    volume: int
+    issue: int
+    year: int
+    pages: str
+
+
+class Line(NamedTuple):
+    # Distance from the top of the page, in points
+    top: float
+    size: int
+    bold: bool
+    text: str
+
+
+def make_title(rng):
+    words = []
+    for _ in range(rng.randint(5, 14)):
+        if words and rng.random() < .3:
+            words.append(rng.choice(TITLE_JOINERS))
+        words.append(rng.choice(TITLE_WORDS).capitalize())
+    return ' '.join(words)
+
+
+def make_article(number, rng):
+    '''Return the fields of synthetic article number.'''
+    volume = rng.randint(1, 5)
+    issue = rng.randint(1, 4)
+    first_page = rng.randint(1, 400)
+    authors = [f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+               for _ in range(rng.randint(1, 3))] + ['Dr. Abdul Ghafoor Awan']
+    return SyntheticArticle(
+        filename=f'{number:05d}-{authors[0].replace(" ", "-")}-research-paper.pdf',
+        title=make_title(rng),
+        authors=authors,
+        volume=volume,
+        issue=issue,
+        year=START_YEAR + volume - 1,
+        pages=f'{first_page}-{first_page + rng.randint(5, 20)}',
+    )
+
+
+def wrap(text, width):
+    lines, line = [], ''
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f'{line} {word}' if line else word
+    return lines + [line] if line else lines
+
+
+def page_lines(article, rng, body_lines=30):
+    '''Return the Line list of the first page of article.'''
+    if rng.random() < .5:
+        vol_issue = f'Vol {article.volume} ({article.issue})'
+    else:
+        vol_issue = f'Vol. {article.volume}, No.{article.issue}'
+    lines = [
+        Line(40, 9, False, MASTHEAD),
+        Line(52, 9, False, f'{vol_issue} {ISSUE_MONTHS[article.issue]}, {article.year} pp. {article.pages}'),
+        Line(64, 9, False, ISSN),
+    ]
+    top = 110
+    for text in wrap(article.title, 50):
+        lines.append(Line(top, 16, True, text))
+        top += 20
+    top += 14
+    lines.append(Line(top, 11, False, ', '.join(
+        f'{name}{i}' for i, name in enumerate(article.authors, 1))))
+    top += 30
+    lines.append(Line(top, 11, True, 'ABSTRACT'))
+    top += 16
+    for _ in range(body_lines):
+        lines.append(Line(top, 10, False, ' '.join(rng.choice(BODY_WORDS) for _ in range(14))))
+        top += 13
+    return lines
+
+
+def pdf_string(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+def pdf_bytes(lines):
+    '''Return a minimal single page PDF (standard Helvetica fonts) showing lines.'''
+    content = ''.join(
+        f'BT /{"F2" if line.bold else "F1"} {line.size} Tf 72 {PAGE_HEIGHT - line.top} Td '
+        f'{pdf_string(line.text)} Tj ET\n' for line in lines).encode('latin-1')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+        f'/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>'.encode('ascii'),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n' % len(content) + content + b'endstream',
+    ]
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def pdftohtml_xml(lines):
+    '''Return the ElementTree pdftohtml -xml produces for the page of lines.'''
+    root = etree.Element('pdf2xml')
+    page = etree.SubElement(root, 'page', number='1', position='absolute', top='0', left='0',
+                            height=str(round(PAGE_HEIGHT * XML_ZOOM)),
+                            width=str(round(PAGE_WIDTH * XML_ZOOM)))
+    fonts = {}
+    for line in lines:
+        key = (line.size, line.bold)
+        if key not in fonts:
+            fonts[key] = str(len(fonts))
+            etree.SubElement(page, 'fontspec', id=fonts[key], size=str(line.size),
+                             family='Helvetica-Bold' if line.bold else 'Helvetica', color='#000000')
+    for line in lines:
+        height = round(line.size * XML_ZOOM)
+        text = etree.SubElement(page, 'text', top=str(round(line.top * XML_ZOOM) - height),
+                                left=str(round(72 * XML_ZOOM)),
+                                width=str(round(len(line.text) * line.size * .5 * XML_ZOOM)),
+                                height=str(height), font=fonts[(line.size, line.bold)])
+        if line.bold:
+            etree.SubElement(text, 'b').text = line.text
+        else:
+            text.text = line.text
+    return etree.ElementTree(root)
+
+
+def page_text(lines):
+    '''Return plain text of the page, as extracted by Tika.'''
+    return '\n'.join(line.text for line in lines) + '\n'
+
+
+class CorpusEntry(NamedTuple):
+    path: str
+    article: SyntheticArticle
+    xml_data: etree.ElementTree
+    text: str
+
+
+def write_corpus(directory, count, seed=0):
+    '''
+        Write count synthetic article pdfs to directory.
+
+        @returns:
+            corpus (list): CorpusEntry of every article, same seed same corpus
+    '''
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for number in range(1, count + 1):
+        article = make_article(number, rng)
+        lines = page_lines(article, rng)
+        path = os.path.join(directory, article.filename)
+        with open(path, 'wb') as f:
+            f.write(pdf_bytes(lines))
+        corpus.append(CorpusEntry(path, article, pdftohtml_xml(lines), page_text(lines)))
+    return corpus
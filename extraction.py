@@ -0,0 +1,188 @@
+'''
+    Text extraction backends for pdf.Article.
+
+    Every backend exposes parse(path) returning the same mapping as
+    tika.parser.from_file i.e., {'status': 200, 'content': '...', 'metadata': None}
+'''
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import pdftitle
+
+TIKA_URL = 'http://localhost:9998'
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class PdftohtmlExtractor:
+    '''
+        Extract text with pdftohtml, used when no JVM is available.
+
+        Attributes:
+            pages = Number of leading pages converted
+    '''
+
+    def __init__(self, pages=1, timeout=60):
+        self.pages = pages
+        self.timeout = timeout
+
+    def parse(self, path):
+        _, text = pdftitle.stream_pdf_xml(path, self.pages, timeout=self.timeout)
+        return {'status': 200, 'content': text, 'metadata': None}
+
+
+class TikaServer:
+    '''
+        A single local Tika server reached through one pooled HTTP session.
+
+        Attributes:
+            url = Base url of the server
+            jar_path = tika-server.jar started by start() when nothing answers on url
+            concurrency = Maximum number of parse requests in flight
+            timeout = Seconds allowed per parse request
+            fallback = Backend used when the server can't be reached (eg. PdftohtmlExtractor)
+    '''
+
+    def __init__(self, url=TIKA_URL, jar_path=None, concurrency=4, timeout=120,
+                 startup_timeout=60, fallback=None):
+        self.url = url.rstrip('/')
+        self.jar_path = jar_path
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.fallback = fallback
+        self.process = None
+        self.available = True
+        self._connect()
+
+    def _connect(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def __getstate__(self):
+        # Pool workers receive the configuration only; they talk to the
+        # server started by the parent over their own session.
+        state = self.__dict__.copy()
+        for key in ('session', '_slots', 'process'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.process = None
+        self._connect()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def healthy(self):
+        '''Return True if the server answers on url.'''
+        try:
+            return self.session.get(self.url + '/tika', timeout=2).ok
+        except requests.RequestException:
+            return False
+
+    def start(self):
+        '''
+            Make sure a server answers on url, launching jar_path when needed.
+            Falls back (available = False) instead of failing when a fallback is set.
+        '''
+        if self.healthy():
+            return self
+
+        try:
+            self._launch()
+        except (OSError, ExtractionError):
+            if self.fallback is None:
+                raise
+            self.available = False
+        return self
+
+    def _launch(self):
+        if not self.jar_path:
+            raise ExtractionError(f"No Tika server on {self.url} and no jar_path to start one.")
+
+        port = urlparse(self.url).port or 9998
+        self.process = subprocess.Popen(
+            ['java', '-jar', self.jar_path, '--port', str(port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise ExtractionError(
+                    f"Tika server exited with {self.process.returncode}.")
+            if self.healthy():
+                return
+            time.sleep(.5)
+
+        self.stop()
+        raise ExtractionError(f"Tika server not ready after {self.startup_timeout}s.")
+
+    def stop(self):
+        '''Terminate the server started by start() and close the session.'''
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        self.session.close()
+
+    def parse(self, path):
+        '''Return parsed content of the file at path.'''
+        if not self.available:
+            return self.fallback.parse(path)
+
+        try:
+            with self._slots, open(path, 'rb') as f:
+                response = self.session.put(
+                    self.url + '/tika', data=f,
+                    headers={'Accept': 'text/plain'}, timeout=self.timeout)
+        except requests.ConnectionError as e:
+            if self.fallback is None:
+                raise ExtractionError(str(e)) from None
+            return self.fallback.parse(path)
+        except requests.RequestException as e:
+            # The request (and the open file as its body) can't be pickled
+            # back from a pool worker, keep the message only
+            raise ExtractionError(str(e)) from None
+
+        return {
+            'status': response.status_code,
+            'content': response.text if response.ok else None,
+            'metadata': None,
+        }
+
+    def parse_many(self, paths):
+        '''
+            Parse many files keeping at most {concurrency} requests in flight.
+
+            @yields:
+                (path, parsed, error) in completion order.
+        '''
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            future_to_path = {executor.submit(self.parse, path): path for path in paths}
+
+            for future in as_completed(future_to_path):
+                path = future_to_path[future]
+                try:
+                    yield path, future.result(), None
+                except Exception as e:
+                    yield path, None, e
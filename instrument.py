@@ -0,0 +1,186 @@
+'''
+    Lightweight instrumentation of the extraction pipeline.
+
+    Stages are timed with instrument.timer(name) and events counted with
+    instrument.count(name); both do nothing unless a Stats is active, so the
+    calls can stay in the hot paths. measure() activates a fresh Stats for
+    one file and optionally captures a cProfile dump and the tracemalloc
+    peak of it. Stats of many files (eg. from pool workers, see to_dict)
+    are merged into a batch summary printed as a table or json.
+
+    Usage:
+        stats = instrument.Stats()
+        with instrument.measure(path) as file_stats:
+            ...
+        stats.merge(file_stats.to_dict())
+        stats.print_table()
+'''
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_active = None
+
+
+class Stats:
+    '''
+        Timers, counters and per file records.
+
+        Attributes:
+            timers = {stage: [calls, total seconds, max seconds]}
+            counters = {name: value}, eg. files, bytes, cache.hits, failures
+            files = [{'path', 'seconds', 'bytes', 'peak_memory', 'error'}, ...]
+    '''
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self.files = []
+
+    def add_time(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def stage_hook(self, prefix=''):
+        '''Return hook for pdftitle.Pipeline timing every stage as {prefix}{stage}.'''
+        return lambda stage, seconds: self.add_time(prefix + stage, seconds)
+
+    def to_dict(self):
+        return {'timers': self.timers, 'counters': self.counters, 'files': self.files}
+
+    def merge(self, data):
+        '''Add the timers, counters and files of a to_dict() snapshot.'''
+        for name, (calls, seconds, longest) in data['timers'].items():
+            timer = self.timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+            timer[2] = max(timer[2], longest)
+        for name, value in data['counters'].items():
+            self.count(name, value)
+        self.files.extend(data['files'])
+
+    def slowest(self, n=10):
+        return sorted(self.files, key=lambda record: record['seconds'], reverse=True)[:n]
+
+    def summary(self, slowest=10):
+        return {
+            'timers': {name: {'calls': calls, 'seconds': seconds, 'max': longest}
+                       for name, (calls, seconds, longest) in self.timers.items()},
+            'counters': self.counters,
+            'slowest': self.slowest(slowest),
+        }
+
+    def print_table(self, out=None, slowest=10):
+        '''Print stage timers, counters and the slowest files.'''
+        out = out or sys.stdout
+        rows = [[name, calls, f'{seconds:.3f}', f'{seconds / calls * 1000:.2f}', f'{longest * 1000:.2f}']
+                for name, (calls, seconds, longest) in
+                sorted(self.timers.items(), key=lambda item: item[1][1], reverse=True)]
+        write_table(out, ['stage', 'calls', 'total s', 'mean ms', 'max ms'], rows)
+        if self.counters:
+            out.write('\n')
+            write_table(out, ['counter', 'value'], sorted(self.counters.items()))
+        if self.files:
+            out.write('\n')
+            write_table(out, ['file', 'seconds', 'bytes', 'peak KiB', 'error'], [
+                [record['path'], f"{record['seconds']:.3f}", record['bytes'],
+                 '' if record['peak_memory'] is None else record['peak_memory'] // 1024,
+                 record['error'] or ''] for record in self.slowest(slowest)])
+
+    def dump_json(self, fp, slowest=10):
+        json.dump(self.summary(slowest), fp, indent=2)
+        fp.write('\n')
+
+
+def write_table(out, header, rows):
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        out.write('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip() + '\n')
+
+
+def active():
+    '''Return the Stats being recorded or None.'''
+    return _active
+
+
+def activate(stats):
+    '''Make stats (or None) the active Stats and return the previous one.'''
+    global _active
+    previous, _active = _active, stats
+    return previous
+
+
+def timer(name):
+    '''Context manager timing stage name into the active Stats.'''
+    return _active.timer(name) if _active is not None else nullcontext()
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+@contextmanager
+def measure(path, profile_dir=None, trace_memory=False):
+    '''
+        Record the processing of the file at path into a fresh active Stats.
+
+        @args:
+            profile_dir: Write a cProfile dump of the file to {profile_dir}/{filename}.prof
+            trace_memory: Record the tracemalloc peak (slows everything down)
+
+        @yields:
+            stats (Stats): With one record in files, including the error raised if any
+    '''
+    stats = Stats()
+    record = {'path': path, 'seconds': 0.0, 'bytes': os.path.getsize(path),
+              'peak_memory': None, 'error': None}
+    profiler = cProfile.Profile() if profile_dir else None
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    previous = activate(stats)
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield stats
+    except Exception as e:
+        record['error'] = repr(e)
+        stats.count('failures')
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['seconds'] = time.perf_counter() - start
+        if tracing:
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        activate(previous)
+
+        stats.count('files')
+        stats.count('bytes', record['bytes'])
+        stats.files.append(record)
+        if profiler is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, os.path.basename(path) + '.prof'))
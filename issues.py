@@ -0,0 +1,166 @@
+'''
+    Grouping and numbering of the article rows of every issue.
+
+    Articles are bucketed by (volume, issue) and every bucket is ordered by
+    its parsed page range and numbered from 1. Rows are produced one issue
+    at a time, so only the articles of the current issue are held; the
+    articles have to be grouped by issue (eg. sorted by article_order, or in
+    the order of the archive tree), an issue coming back after another one
+    raises IssueOrderError instead of being numbered twice.
+
+    Page ranges are checked against the previous row of the issue, rows are
+    flagged with:
+        missing = no page range could be parsed
+        reversed = the range ends before it starts
+        overlap = the range starts before the previous one ended
+        gap = pages are skipped since the previous range
+'''
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+PAGE_RANGE = re.compile(r'(?P<start>\d+)\s*(?:[-–.]+\s*(?P<end>\d+))?')
+
+MISSING = 'missing'
+REVERSED = 'reversed'
+OVERLAP = 'overlap'
+GAP = 'gap'
+
+
+class IssueOrderError(Exception):
+    pass
+
+
+class NumberedRow(NamedTuple):
+    number: int
+    # Anything with volume, issue and page_range, eg. pdf.TableHandler
+    article: object
+    pages: Optional[Tuple[int, int]]
+    flags: Tuple[str, ...]
+
+
+class IssueRows(NamedTuple):
+    volume: int
+    issue: int
+    rows: List[NumberedRow]
+
+
+def parse_page_range(page_range):
+    '''
+        Return (start, end) of a page range or None.
+
+        Example: '12-34' -> (12, 34), '12 - 34' -> (12, 34), '7' -> (7, 7)
+    '''
+    found = PAGE_RANGE.search(page_range or '')
+    if found is None:
+        return None
+    start = int(found.group('start'))
+    return start, int(found.group('end') or start)
+
+
+def issue_key(article):
+    '''Return (volume, issue) of article as integers, usable as a sort key.'''
+    return int(article.volume), int(article.issue)
+
+
+def page_order(pages):
+    # Articles without a page range go last
+    return (pages is None, pages or (0, 0))
+
+
+def article_order(article):
+    '''Sort key of articles by issue, then by page range.'''
+    return issue_key(article), page_order(parse_page_range(article.page_range))
+
+
+def check_pages(pages, previous_end):
+    '''Return flags of pages following a range ending at previous_end (None for the first row).'''
+    if pages is None:
+        return (MISSING,)
+    start, end = pages
+    flags = []
+    if end < start:
+        flags.append(REVERSED)
+    if previous_end is not None:
+        if start <= previous_end:
+            flags.append(OVERLAP)
+        elif start > previous_end + 1:
+            flags.append(GAP)
+    return tuple(flags)
+
+
+class IssueNumbering:
+    '''
+        Numbers the rows of every issue.
+
+        An issue seen again (eg. in a later batch) continues after its last
+        number and is checked against its last page.
+
+        Attributes:
+            first_number = Optional callable (volume, issue) -> number of the
+                first row, eg. archive_index.ArchiveIndex.next_row_number to
+                continue the rows already on the archive page
+            last = {(volume, issue): (last number, last page or None)}
+    '''
+
+    def __init__(self, first_number=None):
+        self.first_number = first_number
+        self.last = {}
+
+    def number(self, key, articles):
+        '''Return IssueRows of articles of issue key, ordered by page range.'''
+        if key in self.last:
+            number, previous_end = self.last[key]
+        else:
+            number = self.first_number(*key) - 1 if self.first_number else 0
+            previous_end = None
+
+        rows = []
+        ordered = sorted(((article, parse_page_range(article.page_range)) for article in articles),
+                         key=lambda row: page_order(row[1]))
+        for article, pages in ordered:
+            number += 1
+            rows.append(NumberedRow(number, article, pages, check_pages(pages, previous_end)))
+            if pages is not None:
+                previous_end = max(pages[1], previous_end or 0)
+
+        self.last[key] = (number, previous_end)
+        return IssueRows(key[0], key[1], rows)
+
+    def stream(self, articles):
+        '''
+            Yield IssueRows every time the issue of articles changes, only the
+            articles of one issue are held at once.
+
+            @raises:
+                IssueOrderError when articles aren't grouped by issue
+        '''
+        key = None
+        bucket = []
+        # Issues already numbered by this call
+        done = set()
+        for article in articles:
+            article_key = issue_key(article)
+            if bucket and article_key != key:
+                yield self.number(key, bucket)
+                done.add(key)
+                bucket = []
+            if article_key in done:
+                raise IssueOrderError(
+                    f"Vol {article_key[0]} No. {article_key[1]} comes back after another issue, "
+                    f"group the articles by issue (eg. sort them by issues.article_order).")
+            key = article_key
+            bucket.append(article)
+        if bucket:
+            yield self.number(key, bucket)
+
+
+def stream_issues(articles, first_number=None):
+    '''Yield IssueRows of articles grouped by issue, see IssueNumbering.stream.'''
+    return IssueNumbering(first_number).stream(articles)
+
+
+def describe(issue, row):
+    '''Return a line describing the flags of row, eg. for a warning.'''
+    pages = '-'.join(map(str, row.pages)) if row.pages else repr(row.article.page_range)
+    return (f"Vol {issue.volume} No. {issue.issue} row {row.number} "
+            f"({getattr(row.article, 'filename', row.article)}): pages {pages} {', '.join(row.flags)}")
@@ -1,20 +1,35 @@
-import requests
-import bs4
+import os
+
+import scanner
 
 ROOT_URL = 'http://gjmsweb.com/archives/'
+# Used only when there's no local archive tree to scan
 START_YEAR = 2015
 END_YEAR = 2019
-VOLUME_START = 1
-VOLUME_END = 5
 ISSUE_START = 1
-ISSUE_END = 5
+ISSUE_END = 4
+
+
+def issue_url(year, volume, issue):
+    return ROOT_URL + str(year) + "/" + "Volume {}".format(volume) + "/Issue {}, {}".format(issue, year)
+
+
+def issue_urls(root=scanner.ARCHIVE_DIR):
+    '''Return urls of the issue directories, discovered from the local archive tree when it exists.'''
+    if os.path.isdir(root):
+        issues = {(i.year, i.volume, i.issue) for i in scanner.scan_archive(root)
+                  if None not in (i.year, i.volume, i.issue)}
+        return [issue_url(*i) for i in sorted(issues)]
+
+    return [issue_url(year, (year - START_YEAR) + 1, issue)
+            for year in range(START_YEAR, END_YEAR + 1)
+            for issue in range(ISSUE_START, ISSUE_END + 1)]
 
 
 def main():
-    for year in range(START_YEAR, END_YEAR+1):
-        for issue in range(ISSUE_START, ISSUE_END):
-            print(ROOT_URL + str(year) + "/" + "Volume {}".format((year-START_YEAR)+1) + "/Issue {}, {}".format(issue, year))
+    for url in issue_urls():
+        print(url)
+
 
-            # r = requests.get(ROOT_URL + str(year) + "/" + "Issue {}, {}".format(issue, year))
-            # soup = bs4.BeautifulSoup()
-main()
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,331 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+import time
 from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
 import requests
 import bs4
+import lxml.etree
 import concurrent.futures
 from time import sleep
 
 ROOT_URL = 'http://gjmsweb.com/'
+ARCHIVE_URL = ROOT_URL + 'archives.php'
+
+# Statuses worth retrying and statuses of servers refusing HEAD requests
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HEAD_UNSUPPORTED = {403, 405, 501}
+OK_STATUSES = {200, 206}
+
+
+def pdf_href(href, root_url=ROOT_URL):
+    '''Return absolute link of href if it points to a pdf, else None.'''
+    if href is not None and href.endswith('.pdf'):
+        if not href.startswith('http'):
+            href = urljoin(root_url, href)
+        return href
 
-def fetch_pdf_links(page):
+
+def fetch_pdf_links(page, root_url=ROOT_URL):
     pdf_links = []
     for i in page.find_all('a'):
-        href = i.get('href')
-        if href is not None and href.endswith('.pdf'):
-            if not href.startswith('http'):
-                href = ROOT_URL + href
+        href = pdf_href(i.get('href'), root_url)
+        if href:
             pdf_links.append(href)
     return pdf_links
 
+
+class LinkExtractor:
+    '''
+        Incremental pdf link extractor fed with chunks (bytes) of a page.
+
+        Elements are discarded once parsed so memory doesn't grow with the page.
+    '''
+
+    def __init__(self, root_url=ROOT_URL):
+        self.root_url = root_url
+        self.parser = lxml.etree.HTMLPullParser(events=('start', 'end'))
+
+    def _links(self):
+        links = []
+        for event, element in self.parser.read_events():
+            if event == 'start':
+                if element.tag == 'a':
+                    href = pdf_href(element.get('href'), self.root_url)
+                    if href:
+                        links.append(href)
+            else:
+                element.clear()
+                # Siblings of the root (eg. a <?php ?> before <html>) have no parent
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+        return links
+
+    def feed(self, chunk):
+        '''Return pdf links completed by chunk.'''
+        self.parser.feed(chunk)
+        return self._links()
+
+    def close(self):
+        '''Return remaining pdf links at the end of the page.'''
+        self.parser.close()
+        return self._links()
+
+
+def iter_pdf_links(chunks, root_url=ROOT_URL):
+    '''Yield pdf links of a page while its chunks are being parsed.'''
+    extractor = LinkExtractor(root_url)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+    yield from extractor.close()
+
+
+async def stream_archive_links(archive_url=ARCHIVE_URL, chunk_size=1 << 14):
+    '''Download the archive page and yield its pdf links as they arrive.'''
+    extractor = LinkExtractor(archive_url)
+    async with aiohttp.ClientSession() as session:
+        async with session.get(archive_url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                for href in extractor.feed(chunk):
+                    yield href
+    for href in extractor.close():
+        yield href
+
 def make_requests(url, timeout):
     return url, requests.get(url, timeout=timeout).status_code
 
-def main():
-    response = requests.get('http://gjmsweb.com/archives.php')
+
+class TokenBucket:
+    '''
+        Rate limiter allowing {rate} requests per second with bursts of up to
+        {capacity} requests.
+    '''
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LinkStateStore:
+    '''
+        Persisted state of checked links (sqlite) so that re-runs only recheck
+        what is new, stale or broken.
+
+        Every row holds: url, status, etag, last_modified, checked_at
+    '''
+
+    def __init__(self, path='link_state.sqlite'):
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS links ('
+            'url TEXT PRIMARY KEY, status INTEGER, etag TEXT, '
+            'last_modified TEXT, checked_at REAL)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, url):
+        row = self.connection.execute(
+            'SELECT * FROM links WHERE url = ?', (url,)).fetchone()
+        return dict(row) if row else None
+
+    def stored_result(self, url, ttl, now=None):
+        '''
+            Return stored result of url if it needn't be checked, None when it
+            is new, older than ttl seconds or was broken on the last run.
+        '''
+        now = time.time() if now is None else now
+        state = self.get(url)
+        if state is None or now - state['checked_at'] > ttl or is_broken(state):
+            return None
+        return {'url': url, 'status': state['status'], 'method': 'STORED', 'error': None}
+
+    def update(self, results, now=None):
+        '''Store the results of check_link.'''
+        now = time.time() if now is None else now
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?, ?)',
+                [(result['url'], result['status'], result.get('etag'),
+                  result.get('last_modified'), now) for result in results])
+
+
+def is_broken(result):
+    return result['status'] not in OK_STATUSES
+
+
+def conditional_headers(state):
+    '''Return If-None-Match/If-Modified-Since headers for a stored link state.'''
+    headers = {}
+    if state and not is_broken(state):
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+    return headers
+
+
+async def check_link(session, url, bucket, retries=3, backoff=.5, state=None):
+    '''
+        Check url with a HEAD request, falling back to a single byte ranged GET
+        when HEAD isn't supported. Timeouts, connection errors and RETRY_STATUSES
+        are retried with exponential backoff.
+
+        With a stored state the request is conditional and a 304 response keeps
+        the stored status.
+
+        @returns:
+            result (dict): {'url': ..., 'status': 200, 'method': 'HEAD', 'error': None,
+                            'etag': ..., 'last_modified': ...}
+    '''
+    result = {'url': url, 'status': None, 'method': 'HEAD', 'error': None}
+    headers = conditional_headers(state)
+
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            async with session.head(url, headers=headers, allow_redirects=True) as response:
+                result.update(status=response.status, method='HEAD', error=None,
+                              etag=response.headers.get('ETag'),
+                              last_modified=response.headers.get('Last-Modified'))
+
+            if result['status'] in HEAD_UNSUPPORTED:
+                async with session.get(url, headers=dict(headers, Range='bytes=0-0'),
+                                       allow_redirects=True) as response:
+                    result.update(status=response.status, method='GET',
+                                  etag=response.headers.get('ETag'),
+                                  last_modified=response.headers.get('Last-Modified'))
+
+            if result['status'] == 304 and state:
+                result.update(status=state['status'],
+                              etag=result['etag'] or state['etag'],
+                              last_modified=result['last_modified'] or state['last_modified'])
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result.update(status=None, error=repr(e))
+
+        if result['error'] is None and result['status'] not in RETRY_STATUSES:
+            break
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+    return result
+
+
+async def check_links(urls, concurrency=20, per_host=4, rate=20, timeout=10, retries=3,
+                      store=None):
+    '''
+        Check every url concurrently over pooled connections, rate limited per host.
+
+        @args:
+            urls: Links to be checked, an async iterable is checked while it is produced
+            concurrency: Total number of open connections
+            per_host: Open connections per host
+            rate: Requests per second per host
+            timeout: Seconds allowed per request
+            store: Optional LinkStateStore used for conditional requests
+
+        @returns:
+            results (list): check_link results in the order of urls
+    '''
+    buckets = {}
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+
+    async with aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+
+        async def check(url):
+            host = urlparse(url).netloc
+            if host not in buckets:
+                buckets[host] = TokenBucket(rate)
+            state = store.get(url) if store else None
+            return await check_link(session, url, buckets[host], retries=retries, state=state)
+
+        if hasattr(urls, '__aiter__'):
+            tasks = [asyncio.create_task(check(url)) async for url in urls]
+        else:
+            tasks = [asyncio.create_task(check(url)) for url in urls]
+        return await asyncio.gather(*tasks)
+
+
+def write_report(results, fp):
+    '''Write a json report of the checked links listing the broken ones.'''
+    broken = [result for result in results if is_broken(result)]
+    json.dump({'checked': len(results), 'broken': broken}, fp, indent=2)
+    fp.write('\n')
+
+
+def fetch_archive_links(archive_url=ARCHIVE_URL):
+    response = requests.get(archive_url)
     soup = bs4.BeautifulSoup(response.text, 'lxml')
-    pdf_links = fetch_pdf_links(soup)
-    
+    return fetch_pdf_links(soup, root_url=archive_url)
+
+
+async def due_links(links, store, ttl, fresh):
+    '''Yield links needing a check, collecting stored results of the others in fresh.'''
+    async for url in links:
+        result = store.stored_result(url, ttl)
+        if result is None:
+            yield url
+        else:
+            fresh.append(result)
+
+
+def main_async(args):
+    pdf_links = stream_archive_links(args.archive_url)
+    store = LinkStateStore(args.state) if args.state else None
+    fresh = []
+    if store:
+        pdf_links = due_links(pdf_links, store, args.ttl, fresh)
+
+    try:
+        results = asyncio.run(check_links(
+            pdf_links, concurrency=args.concurrency, per_host=args.per_host,
+            rate=args.rate, timeout=args.timeout, retries=args.retries, store=store))
+        if store:
+            store.update(results)
+    finally:
+        if store:
+            store.close()
+    results = fresh + results
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            write_report(results, f)
+    else:
+        write_report(results, sys.stdout)
+    return results
+
+
+def main(archive_url=ARCHIVE_URL):
+    pdf_links = fetch_archive_links(archive_url)
+
     with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
         future_to_url = {executor.submit(
             make_requests, url, 10): url for url in pdf_links}
@@ -39,7 +341,25 @@ def main():
                 sleep(.5)
             except Exception as exc:
                 print('%r generated an exception: %s' % (url, exc))
-    
+
 
 if __name__ == "__main__":
-    main()
+    arg_parser = argparse.ArgumentParser(description='Check pdf links of the archive page.')
+    arg_parser.add_argument('--archive-url', default=ARCHIVE_URL)
+    arg_parser.add_argument('--threads', action='store_true',
+                            help='use the old thread pool checker (full GET per link)')
+    arg_parser.add_argument('--report', help='write json report to this file instead of stdout')
+    arg_parser.add_argument('--concurrency', type=int, default=20)
+    arg_parser.add_argument('--per-host', type=int, default=4)
+    arg_parser.add_argument('--rate', type=float, default=20, help='requests per second per host')
+    arg_parser.add_argument('--timeout', type=float, default=10)
+    arg_parser.add_argument('--retries', type=int, default=3)
+    arg_parser.add_argument('--state', help='sqlite link state store for incremental runs')
+    arg_parser.add_argument('--ttl', type=float, default=7 * 24 * 3600,
+                            help='seconds before a healthy link is checked again')
+    args = arg_parser.parse_args()
+
+    if args.threads:
+        main(args.archive_url)
+    else:
+        main_async(args)
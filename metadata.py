@@ -0,0 +1,75 @@
+'''
+    Precompiled regex extraction of article metadata from the text of its first page.
+
+    Only a bounded header window of the text is scanned since the volume,
+    issue, page range and authors are all printed before the abstract.
+'''
+import re
+from typing import List, NamedTuple, Optional
+
+import util
+
+# Characters (after leading whitespace) scanned for metadata, roughly a first page
+HEADER_WINDOW = 6000
+
+# Tried in order, eg. "Vol 3 (4)" then "Vol. 4, No.3"
+VOL_ISSUE_PATTERNS = (
+    re.compile(r'Vol\s(?P<volume>(\d)+)\s+[(](\s?)+(?P<issue>(\d)+)'),
+    re.compile(r'Vol.?\s+(?P<volume>(\d)+)\s?[,.]?\s+No[.](?P<issue>(\d)+)'),
+)
+PAGES_PATTERN = re.compile(
+    r'(pp|PP)(\s?)+[.,]?(\s?)+-?(?P<paging>(\d\s?)+[-.]+(\s?\d)+)')
+# Tried in order, the authors are on the last line before the marker
+ABSTRACT_MARKERS = ('ABSTRACT', 'Abstract')
+AUTHOR_SEPARATOR = re.compile(r'\d')
+
+
+class ArticleMetadata(NamedTuple):
+    volume: Optional[str]
+    issue: Optional[str]
+    pages: Optional[str]
+    authors: List[str]
+
+
+def header(text, window=HEADER_WINDOW):
+    '''Return the leading window of text (whole text when window is None).'''
+    text = text.lstrip()
+    return text if window is None else text[:window]
+
+
+def find_vol_issue(text):
+    for pattern in VOL_ISSUE_PATTERNS:
+        found = pattern.search(text)
+        if found:
+            return found.group('volume'), found.group('issue')
+    return None, None
+
+
+def find_pages(text):
+    found = PAGES_PATTERN.search(text)
+    if found:
+        return util.sanitize_page(found.group('paging').replace('\n', ''))
+
+
+def find_authors(text):
+    '''Return author names printed on the last line before the abstract.'''
+    for marker in ABSTRACT_MARKERS:
+        end = text.find(marker)
+        if end != -1:
+            line = text[:end].strip().rsplit('\n', 1)[-1]
+            names = (name.strip(', \t') for name in AUTHOR_SEPARATOR.split(line))
+            return [name for name in names if name]
+    return []
+
+
+def extract_metadata(text, window=HEADER_WINDOW):
+    '''
+        Extract every metadata field from the header window of text at once.
+
+        @returns:
+            metadata (ArticleMetadata): eg. ArticleMetadata(volume='4', issue='2',
+                pages='12-34', authors=['Mehreen Riaz', 'Dr. Abdul Ghafoor Awan'])
+    '''
+    text = header(text or '', window)
+    volume, issue = find_vol_issue(text)
+    return ArticleMetadata(volume, issue, find_pages(text), find_authors(text))
@@ -1,9 +1,25 @@
+import argparse
+import json
 import re
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cached_property, partial
 
 from tika import tika, parser
 from titlecase import titlecase
 
+import archive_editor
+import archive_index
+import build
+import cache
+import extraction
+import instrument
+import issues
+import metadata
+import scanner
+import search
+import templates
 import util
 import pdftitle
 
@@ -14,41 +30,116 @@ class Article:
 
         Attributes: 
             path = Location of file
-            pdf = Parser for file for extracting information
+            pdf = Parser for file for extracting information (None when pages is given)
             text = text read from file through parser (pdf)
+            xml_data = Positioned XML of the first pages (only when pages is given)
             filename = Name of file
+
+        When pages is given the file is not sent through Tika; instead only its
+        first {pages} pages are converted once with pdftohtml and both the text
+        and the title are extracted from that single conversion.
+
+        A backend (see extraction.TikaServer) replaces the default tika client.
+
+        The table fields (title, page_range, vol_issue, volume, issue, year and
+        filename_authors) are computed on first access and kept, so the title
+        (a pdftohtml conversion in Tika mode) is only extracted when needed.
+        vol_issue falls back to the vol_issue given, eg. from the archive tree.
     '''
     AUTHOR_STOP_WORDS = ['research', 'paper', '.pdf', 'revised']
 
-    def __init__(self, path):
+    def __init__(self, path, pages=None, backend=None, vol_issue=None):
         self.path = path
-        self.pdf = parser.from_file(self.path)
+        self.pdf = None
+        self.xml_data = None
+        self.vol_issue_hint = vol_issue
+
+        if pages:
+            with instrument.timer('pdftohtml'):
+                self.xml_data, self.text = pdftitle.first_pages(self.path, pages)
+        else:
+            with instrument.timer('tika'):
+                self.pdf = backend.parse(self.path) if backend else parser.from_file(self.path)
 
-        # Tika returns status code if the file is read properly i.e., 200
-        if self.pdf['status'] != 200:
-            raise Exception(
-                f"Unable to parse pdf file. {self.pdf['status']} returned.")
+            # Tika returns status code if the file is read properly i.e., 200
+            if self.pdf['status'] != 200:
+                raise Exception(
+                    f"Unable to parse pdf file. {self.pdf['status']} returned.")
+
+            self.text = self.pdf['content']
 
-        self.text = self.pdf['content']
         self.filename = os.path.basename(path)
+        self._metadata = None
+
+    @classmethod
+    def from_text(cls, path, text, xml_data=None, vol_issue=None):
+        '''Return article of text (and xml_data) already extracted from path, without parsing it.'''
+        article = cls.__new__(cls)
+        article.path = path
+        article.pdf = None
+        article.xml_data = xml_data
+        article.vol_issue_hint = vol_issue
+        article.text = text
+        article.filename = os.path.basename(path)
+        article._metadata = None
+        return article
+
+    @cached_property
+    def title(self):
+        return titlecase(self.raw_title)
+
+    @cached_property
+    def raw_title(self):
+        return self.get_raw_title()
+
+    @cached_property
+    def page_range(self):
+        return self.get_pages()
+
+    @cached_property
+    def vol_issue(self):
+        return self.get_vol_issue() or self.vol_issue_hint
+
+    @property
+    def volume(self):
+        return self.vol_issue[0]
+
+    @property
+    def issue(self):
+        return self.vol_issue[1]
+
+    @property
+    def year(self):
+        return self.get_published_year(self.volume)
+
+    @cached_property
+    def filename_authors(self):
+        return self.get_author_fn()
 
     def get_author_fn(self):
-        return " ".join([i for i in re.split('(\s|\-)', self.filename) if i.isalpha() and i not in self.AUTHOR_STOP_WORDS])
+        return self.author_from_filename(self.filename)
+
+    @classmethod
+    def author_from_filename(cls, filename):
+        return " ".join([i for i in re.split('(\s|\-)', filename) if i.isalpha() and i not in cls.AUTHOR_STOP_WORDS])
 
     # {found} contains the pattern that are matched to extract information from article
     # which are unable to be retrieved through file's meta_data
 
-    def get_authors(self):
-        word = "abstract"
-        splitter = (word.upper(), word.capitalize())
-        content_till_abstract = [self.text.split(abstract)[0].strip(
-        ) for abstract in splitter if abstract in self.text]
+    def get_metadata(self):
+        '''
+            Extract volume, issue, pages and authors from the header of the text at once.
 
-        if not content_till_abstract:
-            return [""]
-            # raise Exception(f"Author not found for: {self.filename}.")
+            @returns:
+                metadata (metadata.ArticleMetadata)
+        '''
+        if self._metadata is None:
+            with instrument.timer('metadata'):
+                self._metadata = metadata.extract_metadata(self.text)
+        return self._metadata
 
-        return [i.strip() for i in re.compile(r'\d').split(content_till_abstract[0].split('\n')[-1])]
+    def get_authors(self):
+        return self.get_metadata().authors or [""]
 
     def get_vol_issue(self):
         '''
@@ -58,16 +149,13 @@ class Article:
                 vol_issue (tuple): Volume and Issue in pair. 
                 eg: ('4', '2')
         '''
-        found = re.search(
-            r'Vol\s(?P<volume>(\d)+)\s+[(](\s?)+(?P<issue>(\d)+)', self.text)
-
-        found = re.search(
-            r'Vol.?\s+(?P<volume>(\d)+)\s?[,.]?\s+No[.](?P<issue>(\d)+)', self.text) if not found else found
+        found = self.get_metadata()
 
-        if found:
-            return found.group('volume'), found.group('issue')
+        if found.volume:
+            return found.volume, found.issue
 
-    def get_published_year(self, volume_number, start_year=2015):
+    @staticmethod
+    def get_published_year(volume_number, start_year=2015):
         '''Obtain published year of the article.'''
         return start_year + (int(volume_number) - 1)
 
@@ -79,11 +167,7 @@ class Article:
                 pages_range (string): Normalized range of pages.
                 eg: 12-34
         '''
-        found = re.search(
-            r'(pp|PP)(\s?)+[.,]?(\s?)+-?(?P<paging>(\d\s?)+[-.]+(\s?\d)+)', self.text)
-
-        if found:
-            return util.sanitize_page(found.group("paging").replace('\n', ''))
+        return self.get_metadata().pages
 
     def get_title(self):
         '''
@@ -92,9 +176,204 @@ class Article:
             @returns:
                 title (string): Normalized Title extracted from the article. 
         '''
-        return titlecase(pdftitle.extract_title(self.path))
+        return self.title
         # return titlecase(pdftitle.extract_title(self.path))
 
+    def get_raw_title(self):
+        '''Return title as found by pdftitle, before titlecase (not memoized, see raw_title).'''
+        xml_data = self.xml_data
+        if xml_data is None:
+            with instrument.timer('pdftohtml'):
+                xml_data = pdftitle.convert_pdf_to_xml(self.path)
+
+        stats = instrument.active()
+        if stats is None:
+            return pdftitle.title_from_xml(xml_data, pdftitle.default_pipeline())
+        pipeline = pdftitle.Pipeline(pdftitle.CONFIG(filename=None), hook=stats.stage_hook('title.'))
+        with stats.timer('title'):
+            return pdftitle.title_from_xml(xml_data, pipeline)
+
+
+# Table field -> Article attribute computing it
+FIELDS = {
+    'title': 'title',
+    'filename': 'filename',
+    'page_range': 'page_range',
+    'volume': 'volume',
+    'issue': 'issue',
+    'year': 'year',
+    'authors': 'filename_authors',
+    'text': 'text',
+}
+# Fields extracted unless others are asked for, the text is only needed by the search index
+TABLE_FIELDS = tuple(name for name in FIELDS if name != 'text')
+# Table field -> metadata cache entry key it is derived from
+CACHED_FIELDS = {
+    'title': 'title',
+    'page_range': 'pages',
+    'volume': 'vol_issue',
+    'issue': 'vol_issue',
+    'year': 'vol_issue',
+    'text': 'text',
+}
+
+
+def article_fields(article, vol_issue=None, fields=None):
+    '''
+        Extract the fields required by TableHandler from an article.
+
+        @args:
+            vol_issue: (volume, issue) used when the article text doesn't state them
+            fields: Names of the fields needed (see FIELDS, TABLE_FIELDS by default), eg.
+                ('volume', 'issue', 'page_range') to validate a batch without extracting
+                any title, or TABLE_FIELDS + ('text',) for the search index
+
+        @returns:
+            fields (dict): Plain (picklable) mapping of table fields.
+    '''
+    if vol_issue is not None and article.vol_issue_hint is None:
+        article.vol_issue_hint = vol_issue
+    return {name: getattr(article, FIELDS[name]) for name in fields or TABLE_FIELDS}
+
+
+def cached_fields(path, metadata_cache, pages=None, backend=None, vol_issue=None, fields=None):
+    '''
+        Return table fields of the file at path, parsing it only when its
+        content hash is missing from metadata_cache. An entry cached without
+        the title (see fields of article_fields) gets it on the first run
+        needing it, from the cached text.
+
+        The author is always derived from the current filename since the
+        cache is keyed by content and the same file may be renamed.
+    '''
+    fields = fields or TABLE_FIELDS
+    digest = cache.file_digest(path)
+    # Text extracted from the first pages differs from the Tika text
+    key = digest if not pages else f'{digest}.p{pages}'
+    entry = metadata_cache.get(key) or {}
+    missing = {CACHED_FIELDS[name] for name in fields if name in CACHED_FIELDS} - entry.keys()
+    instrument.count('cache.misses' if missing else 'cache.hits')
+
+    if missing:
+        if 'text' in entry:
+            article = Article.from_text(path, entry['text'])
+        else:
+            article = Article(path, pages=pages, backend=backend)
+            entry['text'] = article.text
+        if 'title' in missing:
+            entry['title'] = article.raw_title
+        if 'pages' in missing:
+            entry['pages'] = article.page_range
+        if 'vol_issue' in missing:
+            entry['vol_issue'] = article.get_vol_issue()
+        metadata_cache.put(key, entry)
+
+    filename = os.path.basename(path)
+    values = {
+        'title': lambda: titlecase(entry['title']),
+        'filename': lambda: filename,
+        'page_range': lambda: entry['pages'],
+        'volume': lambda: (entry['vol_issue'] or vol_issue)[0],
+        'issue': lambda: (entry['vol_issue'] or vol_issue)[1],
+        'year': lambda: Article.get_published_year((entry['vol_issue'] or vol_issue)[0]),
+        'authors': lambda: Article.author_from_filename(filename),
+        'text': lambda: entry['text'],
+    }
+    return {name: values[name]() for name in fields}
+
+
+# Backend of the current pool worker process, see init_worker
+_worker_backend = None
+
+
+def init_worker(backend=None):
+    '''Configure tika and keep one backend (and its connection pool) per worker process.'''
+    global _worker_backend
+    util.config_tika()
+    _worker_backend = backend
+
+
+def extract_fields(path, metadata_cache=None, pages=None, backend=None, vol_issue=None, fields=None):
+    '''Parse the file at path and return its table fields (runs inside pool workers).'''
+    backend = backend or _worker_backend
+    if metadata_cache is not None:
+        return cached_fields(path, metadata_cache, pages=pages, backend=backend,
+                             vol_issue=vol_issue, fields=fields)
+    return article_fields(Article(path, pages=pages, backend=backend, vol_issue=vol_issue),
+                          fields=fields)
+
+
+def measured_fields(path, profile_dir=None, trace_memory=False, **kwargs):
+    '''
+        extract_fields under instrument.measure (runs inside pool workers).
+
+        @returns:
+            (fields, error, stats): stats is the instrument.Stats.to_dict() of the file
+    '''
+    fields = error = None
+    try:
+        with instrument.measure(path, profile_dir, trace_memory) as stats:
+            fields = extract_fields(path, **kwargs)
+    except Exception as e:
+        error = e
+    return fields, error, stats.to_dict()
+
+
+def ingest(paths, workers=None, metadata_cache=None, pages=None, backend=None, hints=None,
+           stats=None, profile_dir=None, trace_memory=False, fields=None):
+    '''
+        Extract table fields of many files over a process pool.
+
+        @args:
+            paths: Paths of the files to be ingested
+            workers: Number of worker processes (defaults to cpu count), 1 runs in-process
+            metadata_cache: Optional cache.MetadataCache to skip unchanged files
+            pages: Read only the first {pages} pages through pdftohtml instead of Tika
+            backend: Optional extraction.TikaServer (already started) shared by all workers
+            hints: Optional {path: (volume, issue)} used when the text doesn't state them
+            stats: Optional instrument.Stats receiving stage timers and counters of every file
+            profile_dir: Write a cProfile dump of every file there (needs stats)
+            trace_memory: Record the tracemalloc peak of every file (needs stats)
+            fields: Names of the fields needed, all by default (see article_fields)
+
+        @yields:
+            (path, fields, error) in completion order, where exactly one of
+            fields or error is None. A failing file never stops the batch.
+    '''
+    hints = hints or {}
+    if stats is None:
+        extract = partial(extract_fields, metadata_cache=metadata_cache, pages=pages, fields=fields)
+    else:
+        extract = partial(measured_fields, metadata_cache=metadata_cache, pages=pages, fields=fields,
+                          profile_dir=profile_dir, trace_memory=trace_memory)
+
+    def result(path, value):
+        if stats is None:
+            return path, value, None
+        fields, error, file_stats = value
+        stats.merge(file_stats)
+        return path, fields, error
+
+    if workers == 1:
+        for path in paths:
+            try:
+                yield result(path, extract(path, backend=backend, vol_issue=hints.get(path)))
+            except Exception as e:
+                yield path, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(backend,)) as executor:
+        future_to_path = {executor.submit(
+            extract, path, vol_issue=hints.get(path)): path for path in paths}
+
+        for future in as_completed(future_to_path):
+            path = future_to_path[future]
+            try:
+                yield result(path, future.result())
+            except Exception as e:
+                yield path, None, e
+
 
 class TableHandler:
 
@@ -105,20 +384,33 @@ class TableHandler:
         4: "Oct-Dec",
     }
 
-    def __init__(self, meta_data: Article, endpoint='archives.php'):
-        self.title = meta_data.get_title()
-        self.filename = meta_data.filename
-        self.page_range = meta_data.get_pages()
-        self.volume, self.issue = meta_data.get_vol_issue()
-        self.year = meta_data.get_published_year(self.volume)
-        self.authors = meta_data.get_author_fn()
-        self.endpoint = open(endpoint, 'r+')
+    def __init__(self, meta_data, endpoint='archives.php'):
+        # meta_data is either an Article, whose fields are read from it on first
+        # use (see __getattr__), or the fields already extracted from one
+        self.article = None
+        if isinstance(meta_data, dict):
+            for name, value in meta_data.items():
+                if name in TABLE_FIELDS:
+                    setattr(self, name, value)
+        else:
+            self.article = meta_data
+        # Path of the archive page, opened only while it is edited (see archive_editor.ArchiveSession)
+        self.endpoint = endpoint
+
+    def __getattr__(self, name):
+        # Only called for fields not read yet, sorting by page range doesn't extract the title
+        article = self.__dict__.get('article')
+        if article is None or name not in FIELDS:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        value = getattr(article, FIELDS[name])
+        setattr(self, name, value)
+        return value
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.endpoint.close()
+        pass
 
     def generate_header(self):
         '''Produces header for the table.'''
@@ -133,62 +425,201 @@ class TableHandler:
 
             @location:
         '''
-        link = f'"http://gjmsweb.com/archives/{self.year}/Volume {self.volume}/Issue {self.issue}, {self.year}/{self.filename}"'
-
-        return f'''
-        <tr>
-        <td>{number}</td>
-        <td>{self.title} - {self.authors}</td>
-        <td>{self.page_range}</td>
-        <td><a href={link}>PDF</a></td>
-        </tr>
-        '''
+        return templates.row_html(self.row_values(number))
+
+    def row_values(self, number):
+        '''Return values of the row html, see templates.row_html.'''
+        return templates.row_values(
+            number, self.title, self.authors, self.page_range,
+            templates.article_href(self.year, self.volume, self.issue, self.filename))
+
+    def record(self):
+        '''Return the article as a record of the metadata store (see build.py), numbered by build.add_records.'''
+        return {
+            'section': self.generate_header(),
+            'volume': int(self.volume),
+            'issue': int(self.issue),
+            'year': self.year,
+            'number': None,
+            'title': self.title,
+            'authors': self.authors,
+            'pages': self.page_range,
+            'href': templates.article_href(self.year, self.volume, self.issue, self.filename),
+            'filename': self.filename,
+        }
 
     def filter_author(self, key="Abdul Ghafoor"):
         return [author.replace(',', '').strip() for author in self.authors if key not in author]
 
-    def add_section(self):
-        blockquote = self.generate_header()
-        soup_obj = util.create_soup(self.endpoint)
-        last_table = util.get_last_volume(soup_obj)
-        last_table.append(util.get_template(blockquote))
-        print(soup_obj.prettify(formatter=None))
-        # self.endpoint.write(soup_obj)
-
-    def add_article(self):
-        # Raise exception when the section doesn't exist
-        pass
-
-
-if __name__ == '__main__':
-    util.config_tika()
-    files = ["./test_files/" +
-             i for i in os.listdir('./test_files') if i.endswith(".pdf")]
-
-    articles = []
+    def add_section(self, editor=None):
+        '''
+            Add section of the article's issue to the archive page unless it exists.
 
-    for i in files:
-        try:
-            articles.append(TableHandler(Article(i)))
-        except Exception as e:
-            print(e)
+            @args:
+                editor: archive_editor.ArchiveEditor collecting the edits of many
+                articles, without one the page is written right away
+        '''
+        commit = editor is None
+        editor = editor or archive_editor.ArchiveEditor(self.endpoint)
+        if not editor.has_section(self.volume, self.issue):
+            editor.insert_section(self.generate_header(), self.volume, self.issue)
+        if commit:
+            editor.commit()
+
+    def add_article(self, editor=None):
+        '''
+            Append row of the article to its issue section.
 
-    issue_cache = 0
-    index = 1
+            @raises:
+                archive_editor.ArchiveEditError when the section doesn't exist
+        '''
+        commit = editor is None
+        editor = editor or archive_editor.ArchiveEditor(self.endpoint)
+        number = editor.next_row_number(self.volume, self.issue)
+        editor.insert_row(self.volume, self.issue, self.generate_row(number), self.filename)
+        if commit:
+            editor.commit()
 
-    for i in sorted(articles, key=util.fetch_articles_sorting_key):
-        try:
-            if not issue_cache:
-                issue_cache = i.issue
 
-            elif issue_cache != i.issue:
-                issue_cache = i.issue
-                index = 1
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description='Generate archive rows from a directory of articles.')
+    arg_parser.add_argument('directory', nargs='?', default='./test_files',
+                            help=f'directory of pdfs or archive tree (eg. {scanner.ARCHIVE_DIR}/<year>/Volume N/Issue M, YYYY/)')
+    arg_parser.add_argument('-w', '--workers', type=int, default=None,
+                            help='worker processes (default: cpu count, 1 = serial)')
+    arg_parser.add_argument('--cache', default=cache.DEFAULT_CACHE_DIR,
+                            help='metadata cache directory')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='always re-parse every file')
+    arg_parser.add_argument('-p', '--pages', type=int, default=None,
+                            help='read only the first N pages with pdftohtml instead of Tika')
+    arg_parser.add_argument('--tika-url', default=None,
+                            help=f'use a managed Tika server (eg. {extraction.TIKA_URL})')
+    arg_parser.add_argument('--tika-jar', default=None,
+                            help='tika-server.jar started when nothing answers on --tika-url')
+    arg_parser.add_argument('--archive', default='archives.php',
+                            help='archive page the rows belong to')
+    arg_parser.add_argument('--write', action='store_true',
+                            help='insert new sections and rows into --archive (one write)')
+    arg_parser.add_argument('--store', default=None,
+                            help='add the articles to this metadata store (see build.py)')
+    arg_parser.add_argument('--index', default=None,
+                            help=f'add the article texts to this search index (eg. {search.INDEX_DIR}, see search.py)')
+    arg_parser.add_argument('--fields', nargs='+', choices=TABLE_FIELDS, default=None,
+                            help='only extract these fields and print them as json lines, eg. '
+                                 '--fields volume issue page_range validates a batch without extracting titles')
+    arg_parser.add_argument('--changed', action='store_true',
+                            help='only ingest files new or changed since the last run (see --scan-state)')
+    arg_parser.add_argument('--watch', action='store_true',
+                            help='keep polling the directory and ingest files as they arrive')
+    arg_parser.add_argument('--interval', type=float, default=5.0,
+                            help='seconds between two polls of --watch')
+    arg_parser.add_argument('--scan-state', default=scanner.SCAN_STATE_PATH,
+                            help='mtime and size of the files already ingested')
+    arg_parser.add_argument('--stats', choices=['table', 'json'], default=None,
+                            help='print stage timers, counters and slowest files after each batch (stderr)')
+    arg_parser.add_argument('--stats-file', default=None,
+                            help='write the json summary of the last batch to this file')
+    arg_parser.add_argument('--profile', default=None, metavar='DIR',
+                            help='write a cProfile dump of every file to DIR (with --stats)')
+    arg_parser.add_argument('--trace-memory', action='store_true',
+                            help='record peak traced memory of every file (with --stats)')
+    args = arg_parser.parse_args()
+    metadata_cache = None if args.no_cache else cache.MetadataCache(args.cache)
 
-            print(i.generate_row(index))
-            index += 1
-        except Exception as e:
-            print(e)
+    util.config_tika()
+    state = scanner.ScanState(args.scan_state) if args.changed or args.watch else None
+    if args.watch:
+        batches = scanner.watch(args.directory, state, args.interval)
+    else:
+        batches = [scanner.changed_files(args.directory, state)]
+
+    # The text is only pickled back from the workers when it is indexed
+    wanted_fields = args.fields or (TABLE_FIELDS + ('text',) if args.index else None)
+    # With --write the printed rows are numbered like the ones written, after the rows of the page
+    first_number = None
+    if args.write:
+        first_number = archive_index.ArchiveIndex.from_text(archive_index.read_archive(args.archive)).next_row_number
+    numbering = issues.IssueNumbering(first_number)
+
+    backend = None
+    if args.tika_url:
+        backend = extraction.TikaServer(
+            args.tika_url, jar_path=args.tika_jar,
+            fallback=extraction.PdftohtmlExtractor()).start()
+
+    try:
+        for batch in batches:
+            # Volume and issue of the directory tree, used when the text doesn't state them
+            hints = {i.path: i.vol_issue for i in batch}
+            stats = instrument.Stats() if args.stats or args.stats_file else None
+            handlers = []
+            ingested = []
+            succeeded = set()
+            for path, fields, error in ingest([i.path for i in batch], workers=args.workers, metadata_cache=metadata_cache,
+                                              pages=args.pages, backend=backend, hints=hints, stats=stats,
+                                              profile_dir=args.profile, trace_memory=args.trace_memory,
+                                              fields=wanted_fields):
+                if error is not None:
+                    print(f"{path}: {error}")
+                    continue
+                succeeded.add(path)
+                if args.fields:
+                    print(json.dumps(dict(fields, path=path)))
+                    continue
+                handlers.append(TableHandler(fields, endpoint=args.archive))
+                if args.index:
+                    ingested.append((path, fields))
+            # Grouped by issue (see issues.IssueNumbering.stream) and ordered by page range
+            handlers.sort(key=issues.article_order)
+
+            if args.store:
+                added = build.add_records([i.record() for i in handlers], args.store)
+                print(f"{len(added)} articles added to {args.store}, run build.py build to regenerate {args.archive}")
+
+            numbered = handlers
+            if args.write:
+                numbered = []
+                with archive_editor.ArchiveSession(args.archive) as session:
+                    for i in handlers:
+                        if session.add(i):
+                            numbered.append(i)
+                        else:
+                            print(f"{i.filename}: already in Vol {i.volume} No. {i.issue} of {args.archive}")
+
+            if args.index:
+                with search.SearchIndex(args.index) as index:
+                    added = index.add(search.document_from_fields(path, fields) for path, fields in ingested)
+                print(f"{added} articles added to the search index {args.index}")
+
+            if args.stats == 'table':
+                stats.print_table(sys.stderr)
+            elif args.stats == 'json':
+                stats.dump_json(sys.stderr)
+            if args.stats_file:
+                with open(args.stats_file, 'w') as f:
+                    stats.dump_json(f)
+
+            for issue in numbering.stream(numbered):
+                for row in issue.rows:
+                    if row.flags:
+                        print(issues.describe(issue, row), file=sys.stderr)
+                    try:
+                        print(row.article.generate_row(row.number))
+                    except Exception as e:
+                        print(e)
+
+            # Failed files aren't recorded so that they are retried on the next run,
+            # scanner.watch only yields them again once they change
+            if state is not None and not args.fields:
+                state.update(i for i in batch if i.path in succeeded)
+                state.save()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if backend is not None:
+            backend.stop()
 
     # SEPARATE
         # generator = TableHandler(i)
@@ -2,15 +2,18 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import copy
+import contextlib
+import io
+import json
 import os
 import re
 import subprocess
 import sys
+import threading
+import time
 from io import StringIO
 
 import xml.etree.ElementTree as etree
-from bs4 import BeautifulSoup
 
 
 def parse_xml(s):
@@ -37,24 +40,138 @@ def replaceAll(text, lst=('<html>', '</html>', '<body>', '</body>')):
     return text
 
 
-def convert_pdf_to_xml(path):
-    """Return XML string of converted PDF file."""
-    cmd = ['pdftohtml', '-xml', '-f', '1', '-l', '1',
-           '-i', '-q', '-nodrm', '-hidden', '-stdout', path]
+# ASCII control characters other than tab, newline and carriage return
+CONTROL_CHARS = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+
+def pdftohtml_command(path, last_page=1):
+    """Return pdftohtml command converting the first pages of PDF file to XML
+    on stdout."""
+    return ['pdftohtml', '-xml', '-f', '1', '-l', str(last_page),
+            '-i', '-q', '-nodrm', '-hidden', '-stdout', path]
+
+
+def convert_pdf_to_xml_lenient(path, last_page=1, timeout=None):
+    """Return XML of the first pages (up to last_page) of converted PDF file,
+    repairing malformed markup with BeautifulSoup. Slow: the output is parsed
+    three times, kept as a fallback for what the streaming parser rejects."""
+    from bs4 import BeautifulSoup
+
     # https://stackoverflow.com/questions/15374211/why-does-popen-communicate-return-bhi-n-instead-of-hi
     xml_string = subprocess.check_output(
-        cmd, stderr=open(os.devnull, 'w'), universal_newlines=True)
+        pdftohtml_command(path, last_page), stderr=subprocess.DEVNULL,
+        universal_newlines=True, timeout=timeout)
     soup = BeautifulSoup(xml_string, 'xml')
     text = replaceAll(str(soup))
     return parse_xml(StringIO(remove_control_chars(text)))
 
-    # return parse_xml(StringIO(xml_string))
-    # return parse_xml(StringIO(remove_control_chars(xml_string)))
+
+def read_chunks(stream, chunk_size=1 << 16):
+    """Yield chunks of stream with control characters removed."""
+    for chunk in iter(lambda: stream.read(chunk_size), ''):
+        yield remove_control_chars(chunk)
+
+
+def page_text(page):
+    """Return plain text of a page element, one line per non-empty text
+    element."""
+    lines = [unformat_and_strip(t) for t in page.iter('text')]
+    return '\n'.join(line for line in lines if line)
+
+
+def parse_pdf_xml(chunks, keep_page='1'):
+    """Return (XML, plain text) parsed incrementally from chunks of pdftohtml
+    output. Only the keep_page element stays in the tree, every other page is
+    reduced to its text as soon as it is complete."""
+    parser = etree.XMLPullParser(events=('start', 'end'))
+    root = None
+    pages = []
+
+    def consume():
+        nonlocal root
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+            elif element.tag == 'page':
+                pages.append(page_text(element))
+                if element.get('number') != keep_page:
+                    root.remove(element)
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        consume()
+    parser.close()
+    consume()
+    return etree.ElementTree(root), '\n\n'.join(pages)
+
+
+def stream_pdf_xml(path, last_page=1, timeout=None):
+    """Return (XML of page 1, plain text of the first pages) reading the
+    pdftohtml output as it is produced. A conversion running longer than
+    timeout seconds is killed and raises subprocess.TimeoutExpired."""
+    cmd = pdftohtml_command(path, last_page)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, expire) if timeout else None
+    if timer is not None:
+        timer.start()
+
+    try:
+        stream = io.TextIOWrapper(proc.stdout, encoding='utf-8', errors='replace')
+        result = parse_pdf_xml(read_chunks(stream))
+    except etree.ParseError:
+        proc.kill()
+        result = None
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        proc.stdout.close()
+        returncode = proc.wait()
+
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    if result is None:
+        # pdftohtml occasionally emits malformed markup (eg. badly nested <b><i>)
+        xml_data = convert_pdf_to_xml_lenient(path, last_page, timeout=timeout)
+        return xml_data, xml_to_text(xml_data)
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return result
+
+
+def convert_pdf_to_xml(path, last_page=1, timeout=None):
+    """Return XML of converted PDF file (first page only)."""
+    return stream_pdf_xml(path, last_page, timeout=timeout)[0]
+
+
+def xml_to_text(xml_data):
+    """Return plain text of all pages in XML, pages separated by a blank
+    line."""
+    return '\n\n'.join(page_text(page) for page in xml_data.findall('page'))
+
+
+def first_pages(path, pages=1):
+    """Return (XML, plain text) of the first pages of PDF file. The file is
+    converted once; the XML serves title extraction and the text serves the
+    regex based extractors."""
+    return stream_pdf_xml(path, last_page=pages)
 
 
 def remove_control_chars(string):
     """Filter ASCII control characters as etree treats them as invalid."""
-    return ''.join([i for i in string if ord(i) in [9, 10, 13] or ord(i) >= 32])
+    return string.translate(CONTROL_CHARS)
 
 
 def font_specs(xml_data):
@@ -79,19 +196,75 @@ def textblocks_by_id(xml_data, font_id):
     return top_and_texts(text_elements, first_page_top, first_page_height)
 
 
+def index_first_page(xml_data):
+    """Return text elements of page 1 grouped by font id, page top and page
+    height, walking the page only once."""
+    page=xml_data.find('page[@number="1"]')
+    by_font={}
+    for text_element in page.findall('text'):
+        by_font.setdefault(text_element.get('font'), []).append(text_element)
+    return by_font, int(page.get('top')), int(page.get('height'))
+
+
+def textblocks_by_font(xml_data, font_ids):
+    """Return text blocks for every font id, same as calling textblocks_by_id
+    per font id."""
+    by_font, page_top, page_height=index_first_page(xml_data)
+    return [top_and_texts(by_font.get(font_id, []), page_top, page_height)
+            for font_id in font_ids]
+
+
+class TextLine:
+    """Single unformatted non-empty text line of a page."""
+    __slots__=('top', 'height', 'width', 'text')
+
+    def __init__(self, top, height, width, text):
+        self.top=top
+        self.height=height
+        self.width=width
+        self.text=text
+
+    def __eq__(self, other):
+        return (self.top, self.height, self.width, self.text) == \
+            (other.top, other.height, other.width, other.text)
+
+
+class TextBlock:
+    """Text lines of one font id with page metadata. The joined text is
+    computed once on first access."""
+    __slots__=('page_top', 'page_height', 'block_top', 'lines', '_text')
+
+    def __init__(self, page_top, page_height, block_top, lines):
+        self.page_top=page_top
+        self.page_height=page_height
+        self.block_top=block_top
+        self.lines=lines
+        self._text=None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text=' '.join([t.text for t in self.lines])
+        return self._text
+
+    def with_lines(self, lines):
+        """Return copy of block holding only lines (block top is kept)."""
+        return TextBlock(self.page_top, self.page_height, self.block_top, lines)
+
+    def __eq__(self, other):
+        return isinstance(other, TextBlock) and \
+            (self.page_top, self.page_height, self.block_top, self.lines) == \
+            (other.page_top, other.page_height, other.block_top, other.lines)
+
+
 def top_and_texts(text_elements, page_top, page_height):
-    """Return top position of first non-empty text line and all
-    unformatted non-empty text lines, and some extra (page) metadata.
-    Example: {
-      'pageTop': 0,
-      'pageHeight': 1263,
-      'blockTop': 16,
-      'blockText': [
-        {'top': 16, 'height': 24, 'text': 'foo'},
-        {'top': 30, 'height': 24, 'text': 'bar'},
-        {'top': 44, 'height': 24, 'text': 'baz'}
-      ]
-    }"""
+    """Return TextBlock of all unformatted non-empty text lines with the top
+    position of the first one and some extra (page) metadata, or None when
+    there is no line below the page top.
+    Example: TextBlock(page_top=0, page_height=1263, block_top=16, lines=[
+        TextLine(top=16, height=24, width=120, text='foo'),
+        TextLine(top=30, height=24, width=120, text='bar'),
+    ])"""
     text_lines=[]
     top=page_top
 
@@ -109,27 +282,18 @@ def top_and_texts(text_elements, page_top, page_height):
             # Ignore text lines positioned upwards. Only look downwards.
             continue
         top=t
-        text_lines.append({
-            'top': t,
-            'height': h,
-            'width': w,
-            'text': text_line
-        })
+        text_lines.append(TextLine(t, h, w, text_line))
 
     if text_lines and top > page_top:
-        return {
-            'pageTop': page_top,
-            'pageHeight': page_height,
-            'blockTop': min(text_lines, key=lambda x: x['top'])['top'],
-            'blockText': text_lines
-        }
+        return TextBlock(page_top, page_height,
+                         min(t.top for t in text_lines), text_lines)
     else:
-        return {}
+        return None
 
 
 def filter_empties(text_blocks, _config):
     """Filter emtpy text blocks."""
-    return [tb for tb in text_blocks if tb and tb['blockText']]
+    return [tb for tb in text_blocks if tb and tb.lines]
 
 
 def unformat_and_strip(text_element):
@@ -140,38 +304,34 @@ def unformat_and_strip(text_element):
 def filter_bottom_half(text_blocks, _config):
     """Filter text blocks on lower half of page."""
     return [tb for tb in text_blocks if
-            tb['blockTop'] - tb['pageTop'] < tb['pageHeight'] / 2]
+            tb.block_top - tb.page_top < tb.page_height / 2]
 
 
 def filter_margin(text_blocks, config):
     """Filter text blocks above certain top margin."""
-    return [tb for tb in text_blocks if tb['blockTop'] > config.top_margin]
+    return [tb for tb in text_blocks if tb.block_top > config.top_margin]
 
 
 def filter_vertical(text_blocks, _config):
     """Filter text blocks with vertical text."""
     new_text_blocks=[]
     for tb in text_blocks:
-        new_tb=copy.copy(tb)
-        new_tb['blockText']=[]
-        for t in tb['blockText']:
-            if t['width'] > 0:
-                new_tb['blockText'].append(t)
-        if new_tb['blockText']:
-            new_text_blocks.append(new_tb)
+        lines=[t for t in tb.lines if t.width > 0]
+        if len(lines) == len(tb.lines):
+            new_text_blocks.append(tb)
+        elif lines:
+            new_text_blocks.append(tb.with_lines(lines))
     return new_text_blocks
 
 
 def filter_shorts(text_blocks, config):
     """Filter text lines which are too short thus unlikely titles."""
-    return [tb for tb in text_blocks if
-            len(' '.join([t['text'] for t in tb['blockText']])) >= config.min_length]
+    return [tb for tb in text_blocks if len(tb.text) >= config.min_length]
 
 
 def filter_longs(text_blocks, config):
     """Filter text lines which are too long thus unlikely titles."""
-    return [tb for tb in text_blocks if
-            len(' '.join([t['text'] for t in tb['blockText']])) <= config.max_length]
+    return [tb for tb in text_blocks if len(tb.text) <= config.max_length]
 
 
 def filter_unrelated_lines(text_blocks, _config):
@@ -179,15 +339,16 @@ def filter_unrelated_lines(text_blocks, _config):
     lines."""
     new_text_blocks=[]
     for tb in text_blocks:
-        new_tb=copy.copy(tb)
-        new_tb['blockText']=[]
-        next_top=tb['blockTop']
-        for t in tb['blockText']:
-            if t['top'] < next_top + t['height'] / 2:
-                next_top=t['top'] + t['height']
-                new_tb['blockText'].append(t)
-        if new_tb['blockText']:
-            new_text_blocks.append(new_tb)
+        lines=[]
+        next_top=tb.block_top
+        for t in tb.lines:
+            if t.top < next_top + t.height / 2:
+                next_top=t.top + t.height
+                lines.append(t)
+        if len(lines) == len(tb.lines):
+            new_text_blocks.append(tb)
+        elif lines:
+            new_text_blocks.append(tb.with_lines(lines))
     return new_text_blocks
 
 def my_filter(text):
@@ -201,16 +362,29 @@ def choose_title(text_blocks, config):
     or just first."""
     # Have to encode output when piping script. See: http://goo.gl/h0ql0
     for tb in text_blocks:
-        text = ' '.join([t['text'] for t in tb['blockText']]).encode('utf-8').decode()
+        text = tb.text
         if my_filter(text) or ' ' not in text: continue
         if config.multiline:
-            # print(' '.join([t['text'] for t in tb['blockText']]).encode('utf-8'))
-            return ' '.join([t['text'] for t in tb['blockText']]).encode('utf-8')
+            return text.encode('utf-8')
         else:
-            return tb['blockText'][0]['text'].encode('utf-8')
+            return tb.lines[0].text.encode('utf-8')
     return None
 
 
+# Replacements of format_quotes and format_ligatures, applied with str.replace
+# chains (faster than str.translate for multi character keys)
+QUOTES={'‘‘': '“', '’’': '”', '``': '‟', ',,': '„'}
+LIGATURES={'ﬁ': 'fi', 'ﬂ': 'fl'}
+# Deleted from ascii titles to count upper case and space characters
+UPPER_OR_SPACE=bytes(c for c in range(128) if chr(c).isupper() or chr(c).isspace())
+WEIRD_CASE=re.compile(r'[A-Za-z](?:[A-Z][a-z]|[a-z][A-Z])')
+NON_ASCII=re.compile(r'[^\x00-\x7f]')
+LINEBREAK_DASH=re.compile(r'(\S)- (.+)')
+UNSPACE=re.compile(r'([^-])([A-Z])')
+# Joins the titles of a batch, control characters are removed from the page text (see CONTROL_CHARS)
+TITLE_SEPARATOR='\x00'
+
+
 def format_upper_case(title, _config):
     """Return the title in titlecase if all letters are uppercase."""
     return title.title() if is_mostly_upper_case(title) else title
@@ -218,14 +392,15 @@ def format_upper_case(title, _config):
 
 def is_mostly_upper_case(string, threshold=0.67):
     """Return True if string has over Threshold uppercase letters, else False."""
-    n=0
-    for c in string:
-        if c.isupper() or c.isspace():
-            n=n+1
-    if float(n) / len(string) >= threshold:
-        return True
+    if not string:
+        return False
+    if string.isascii():
+        ascii_string=string.encode('ascii')
+        n=len(ascii_string) - len(ascii_string.translate(None, UPPER_OR_SPACE))
     else:
-        False
+        # No character is both upper case and space
+        n=sum(map(str.isupper, string)) + sum(map(str.isspace, string))
+    return n / len(string) >= threshold
 
 
 def format_weird_case(title, _config):
@@ -236,6 +411,11 @@ def format_weird_case(title, _config):
 def is_weird_case(string):
     """Return True if given String has "weird" cases in case letters, else False.
     Example: isWeirdCase('A FAult-tolerAnt token BAsed Algorithm') == True"""
+    # Non ascii characters become '?', keeping the positions of the others
+    if WEIRD_CASE.search(string.encode('ascii', 'replace').decode('ascii')):
+        return True
+    if not any(c.isalpha() or c.isupper() or c.islower() for c in NON_ASCII.findall(string)):
+        return False
     for i in range(len(string) - 2):
         if string[i].isalpha() and (
            string[i+1].isupper() and string[i+2].islower() or
@@ -255,21 +435,18 @@ def format_space_case(title, _config):
 def is_space_case(string, threshold=0.2):
     """Return True if given String has many gaps between letters, else False.
     Example: isSpaceCase('A H i gh - L e ve l F r am e w or k f or') == True"""
-    n=0
-    for c in string:
-        if c.isspace():
-            n=n+1
-    if float(n) / len(string) >= threshold:
-        return True
-    else:
-        False
+    if not string:
+        return False
+    # split() drops exactly the characters for which isspace() is True
+    n=len(string) - sum(map(len, string.split()))
+    return n / len(string) >= threshold
 
 
 def unspace(string):
     """Return the given string without the many gaps between letters.
     Example: unspace('A H i gh - L e ve l F r am e') == A High-Level Frame"""
     joined_string=''.join(string.split())
-    return re.sub(r'([^-])([A-Z])', r'\1 \2', joined_string)
+    return UNSPACE.sub(r'\1 \2', joined_string)
 
 
 def format_multi_spaces(title, _config):
@@ -280,25 +457,29 @@ def format_multi_spaces(title, _config):
 
 def format_linebreak_dash(title, _config):
     """Return the title without linebreak dash."""
-    return re.sub(r'(\S)- (.+)', r'\1-\2', title)
+    return LINEBREAK_DASH.sub(r'\1-\2', title) if '- ' in title else title
 
 
 def format_trailing_period(title, _config):
     """Return the title without trailing period."""
-    return re.sub(r'^(.*)\.$', r'\1', title)
+    # Titles are single line after format_multi_spaces
+    return re.sub(r'^(.*)\.$', r'\1', title) if '\n' in title else title.removesuffix('.')
 
 
 def format_trailing_asterik(title, _config):
     """Return the title without trailing asterik."""
-    return re.sub(r'^(.*)\*$', r'\1', title)
+    return re.sub(r'^(.*)\*$', r'\1', title) if '\n' in title else title.removesuffix('*')
+
+
+def replace_all(text, replacements):
+    for old, new in replacements.items():
+        text=text.replace(old, new)
+    return text
 
 
 def format_quotes(title, _config):
     """Return the title with normalized quotes."""
-    return title.replace('‘‘', '“') \
-                .replace('’’', '”') \
-                .replace('``', '‟') \
-                .replace(',,', '„')
+    return replace_all(title, QUOTES)
 
 
 # TODO: Generalize functionality to convert Unicode NFD->NFC.
@@ -307,52 +488,199 @@ def format_ligatures(title, _config):
     # For a reference of the list see: http://typophile.com/files/PMEJLigR_6061.GIF
     # and https://github.com/Docear/PDF-Inspector/blob/master/src/org/docear/pdf/util/ReplaceLigaturesFilter.java
     title=str(title.decode('utf-8'))
-    return title.replace('ﬁ', 'fi') \
-                .replace('ﬂ', 'fl')
+    return replace_all(title, LIGATURES)
 
 
 def transduce(funs, value, config):
     """Return a value after applying a list of functions until list or value is
     empty."""
-    if not (funs and value):
+    for fun in funs:
+        if not value:
+            break
+        value=fun(value, config)
+    return value
+
+
+GROUPERS=(
+)
+
+FILTERS=(
+    filter_empties,
+    filter_bottom_half,
+    filter_margin,
+    filter_vertical,
+    filter_shorts,
+    filter_longs,
+    filter_unrelated_lines,
+    choose_title,
+)
+
+FORMATTERS=(
+    format_ligatures,
+    format_upper_case,
+    format_weird_case,
+    format_space_case,
+    format_multi_spaces,
+    format_linebreak_dash,
+    format_trailing_period,
+    format_trailing_asterik,
+    format_quotes,
+)
+# Formatters replacing substrings only, run once over a whole batch by format_titles
+JOINED_FORMATTERS=frozenset((format_ligatures, format_quotes))
+
+
+def map_joined(fun, titles):
+    """Return fun applied to all titles (str or bytes) at once, as one value
+    joined with TITLE_SEPARATOR, or to every title when one contains it."""
+    separator=TITLE_SEPARATOR.encode('ascii') if isinstance(titles[0], bytes) else TITLE_SEPARATOR
+    if any(separator in title for title in titles):
+        return [fun(title) for title in titles]
+    joined=fun(separator.join(titles))
+    return joined.split(TITLE_SEPARATOR if isinstance(joined, str) else separator)
+
+
+def format_titles(titles, config, formatters=FORMATTERS):
+    """Return many titles (as returned by choose_title, bytes or None) after
+    applying formatters, same as transduce(formatters, title, config) on
+    every title.
+
+    The formatters of JOINED_FORMATTERS run once over the joined batch, the
+    others title by title; a title is left as is once it is empty."""
+    formatted=list(titles)
+    index=[i for i, title in enumerate(titles) if title]
+    batch=[titles[i] for i in index]
+    for fun in formatters:
+        if not batch:
+            break
+        if fun in JOINED_FORMATTERS:
+            batch=map_joined(lambda text: fun(text, config), batch)
+        else:
+            batch=[fun(title, config) if title else title for title in batch]
+    for i, title in zip(index, batch):
+        formatted[i]=title
+    return formatted
+
+
+class Pipeline:
+    """Groupers, filters and formatters bound to a CONFIG once and reused for
+    many PDFs. An optional hook(stage_name, seconds) is called after every
+    stage, eg. to find out which filter dominates."""
+
+    def __init__(self, config, stages=GROUPERS + FILTERS + FORMATTERS, hook=None):
+        self.config=config
+        self.stages=tuple(stages)
+        self.hook=hook
+
+    def __call__(self, value):
+        config=self.config
+        if self.hook is None:
+            return transduce(self.stages, value, config)
+
+        for stage in self.stages:
+            if not value:
+                break
+            start=time.perf_counter()
+            value=stage(value, config)
+            self.hook(stage.__name__, time.perf_counter() - start)
         return value
-    return transduce(funs[1:], funs[0](value, config), config)
-
-
-def extract_title(path):
-    """Return title in PDF article after applying rules and filters."""
-    config=CONFIG(filename=path)
-
-    groupers=[
-    ]
-
-    filters=[
-        filter_empties,
-        filter_bottom_half,
-        filter_margin,
-        filter_vertical,
-        filter_shorts,
-        filter_longs,
-        filter_unrelated_lines,
-        choose_title
-    ]
-
-    formatters=[
-        format_ligatures,
-        format_upper_case,
-        format_weird_case,
-        format_space_case,
-        format_multi_spaces,
-        format_linebreak_dash,
-        format_trailing_period,
-        format_trailing_asterik,
-        format_quotes
-    ]
-
-    xml_data=convert_pdf_to_xml(path)
+
+
+_default_pipeline=None
+
+
+def default_pipeline():
+    """Return shared pipeline built from the default CONFIG."""
+    global _default_pipeline
+    if _default_pipeline is None:
+        _default_pipeline=Pipeline(CONFIG(filename=None))
+    return _default_pipeline
+
+
+def extract_title(path, xml_data=None, pipeline=None, timeout=None):
+    """Return title in PDF article after applying rules and filters. An
+    already converted xml_data (see first_pages) skips the conversion."""
+    if pipeline is None:
+        pipeline=default_pipeline()
+
+    if xml_data is None:
+        xml_data=convert_pdf_to_xml(path, timeout=timeout)
+    return title_from_xml(xml_data, pipeline)
+
+
+def title_from_xml(xml_data, pipeline):
+    """Return title of converted PDF file after applying pipeline."""
     font_ids=sorted_font_ids(font_specs(xml_data))
-    text_blocks=[textblocks_by_id(xml_data, font_id) for font_id in font_ids]
-    return transduce(groupers + filters + formatters, text_blocks, config)
+    text_blocks=textblocks_by_font(xml_data, font_ids)
+    return pipeline(text_blocks)
+
+
+def extract_titles(paths, workers=4, timeout=60, pipeline=None):
+    """Extract titles of many PDF files with at most workers pdftohtml
+    conversions running at once. Conversions exceeding timeout seconds are
+    killed so their slot is reused by the next file.
+    Yields (path, title, error) in completion order, where exactly one of
+    title or error is None."""
+    # Imported here (like asyncio below) to keep the command line start fast
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        future_to_path={executor.submit(
+            extract_title, path, pipeline=pipeline, timeout=timeout): path for path in paths}
+
+        for future in as_completed(future_to_path):
+            path=future_to_path[future]
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, e
+
+
+async def extract_title_async(path, timeout=60, pipeline=None, semaphore=None):
+    """Return title of PDF file converting it with an asyncio subprocess. The
+    optional semaphore bounds the number of concurrent conversions."""
+    import asyncio
+
+    if pipeline is None:
+        pipeline=default_pipeline()
+
+    async with semaphore or contextlib.nullcontext():
+        cmd=pdftohtml_command(path)
+        proc=await asyncio.create_subprocess_exec(
+            *cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            output, _=await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+    text=output.decode('utf-8', errors='replace')
+    try:
+        xml_data, _=parse_pdf_xml([remove_control_chars(text)])
+    except etree.ParseError:
+        xml_data=await asyncio.to_thread(
+            convert_pdf_to_xml_lenient, path, timeout=timeout)
+    return title_from_xml(xml_data, pipeline)
+
+
+async def extract_titles_async(paths, workers=4, timeout=60, pipeline=None):
+    """Async counterpart of extract_titles, returns list of (path, title,
+    error) in the order of paths."""
+    import asyncio
+
+    semaphore=asyncio.Semaphore(workers)
+
+    async def run(path):
+        try:
+            return path, await extract_title_async(path, timeout, pipeline, semaphore), None
+        except Exception as e:
+            return path, None, e
+
+    return await asyncio.gather(*[run(path) for path in paths])
 
 
 def sanitize_filename(filename):
@@ -363,11 +691,91 @@ def pos_int(v):
     i=int(v)
     if i > 0:
         return i
-    raise argparse.ArgumentTypeError("invalid pos_int value: " % v)
+    raise argparse.ArgumentTypeError("invalid pos_int value: %s" % v)
 
 
 def filepath(v):
     f=os.path.expanduser(v.strip())
     if not os.path.isfile(f) and not os.path.islink(f):
-        raise argparse.ArgumentTypeError("file not found: " % v)
+        raise argparse.ArgumentTypeError("file not found: %s" % v)
     return f
+
+
+def pdf_paths(paths, recursive=False):
+    """Yield PDF files of paths, directories are replaced by the PDF files
+    they contain."""
+    for path in paths:
+        path=os.path.expanduser(path)
+        if not os.path.isdir(path):
+            yield filepath(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.pdf'):
+                    yield os.path.join(root, name)
+            if not recursive:
+                break
+
+
+def rename_to_title(path, title):
+    """Rename PDF file to its title in the same directory, return the new
+    path."""
+    new_path=os.path.join(os.path.dirname(path), sanitize_filename(title) + '.pdf')
+    if new_path != path:
+        if os.path.exists(new_path):
+            raise FileExistsError("file exists: %s" % new_path)
+        os.rename(path, new_path)
+    return new_path
+
+
+def main(argv=None):
+    """Print a JSON line {"path", "title", "error"} per PDF file, in
+    completion order. Returns 1 when any file failed, else 0."""
+    parser=argparse.ArgumentParser(
+        prog='pdftitle', description='Extract titles of PDF articles.')
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='PDF files or directories of PDF files')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + VERSION)
+    parser.add_argument('-R', '--recursive', action='store_true',
+                        help='also read PDF files of subdirectories')
+    parser.add_argument('-w', '--workers', type=pos_int, default=os.cpu_count() or 4,
+                        help='concurrent pdftohtml conversions (default: cpu count)')
+    parser.add_argument('-t', '--timeout', type=pos_int, default=60,
+                        help='seconds allowed per conversion')
+    parser.add_argument('-r', '--rename', action='store_true',
+                        help='rename every file to its title')
+    parser.add_argument('--single-line', action='store_true',
+                        help='keep only the first line of multi line titles')
+    parser.add_argument('--top-margin', type=int, default=70)
+    parser.add_argument('--min-length', type=pos_int, default=15)
+    parser.add_argument('--max-length', type=pos_int, default=250)
+    args=parser.parse_args(argv)
+
+    try:
+        paths=list(pdf_paths(args.paths, args.recursive))
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    config=CONFIG(filename=None, rename=args.rename, multiline=not args.single_line,
+                  top_margin=args.top_margin, min_length=args.min_length,
+                  max_length=args.max_length)
+    failed=False
+    for path, title, error in extract_titles(paths, args.workers, args.timeout, Pipeline(config)):
+        record={'path': path, 'title': title, 'error': None}
+        if error is None and not title:
+            error=ValueError('no title found')
+        if error is None and config.rename:
+            try:
+                record['renamed']=rename_to_title(path, title)
+            except OSError as e:
+                error=e
+        if error is not None:
+            record.update(title=None, error=repr(error))
+            failed=True
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
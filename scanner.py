@@ -0,0 +1,149 @@
+'''
+    Discovery of the article pdfs of a local archive tree.
+
+    The tree mirrors the site:
+        archives/<year>/Volume N/Issue M, YYYY/<article>.pdf
+
+    Volume, issue and year are inferred from the directory names, so new
+    issues are picked up without touching any range constant. A scan state
+    (json, path -> [mtime_ns, size]) records what was ingested so that later
+    runs only return new or changed files.
+'''
+import json
+import os
+import re
+import time
+from typing import NamedTuple, Optional
+
+import atomic
+
+ARCHIVE_DIR = 'archives'
+SCAN_STATE_PATH = '.scan_state.json'
+
+YEAR_DIR = re.compile(r'^(?P<year>\d{4})$')
+VOLUME_DIR = re.compile(r'^Vol(?:ume)?\.?\s*(?P<volume>\d+)$', re.I)
+ISSUE_DIR = re.compile(r'^(?:Issue|No)\.?\s*0?(?P<issue>\d+)(?:\s*,\s*(?P<year>\d{4}))?$', re.I)
+
+
+class ScannedFile(NamedTuple):
+    path: str
+    year: Optional[int]
+    volume: Optional[int]
+    issue: Optional[int]
+    mtime_ns: int
+    size: int
+
+    @property
+    def signature(self):
+        return [self.mtime_ns, self.size]
+
+    @property
+    def vol_issue(self):
+        '''Return (volume, issue) inferred from the path or None.'''
+        if self.volume is not None and self.issue is not None:
+            return str(self.volume), str(self.issue)
+
+
+def infer_location(name, location):
+    '''Return location (dict of year, volume and issue) updated with directory name.'''
+    match = YEAR_DIR.match(name)
+    if match:
+        return dict(location, year=int(match.group('year')))
+    match = VOLUME_DIR.match(name)
+    if match:
+        return dict(location, volume=int(match.group('volume')))
+    match = ISSUE_DIR.match(name)
+    if match:
+        location = dict(location, issue=int(match.group('issue')))
+        if match.group('year'):
+            location['year'] = int(match.group('year'))
+    return location
+
+
+def scan_archive(root=ARCHIVE_DIR):
+    '''
+        Yield a ScannedFile for every pdf below root.
+
+        @args:
+            root: Archive tree, a flat directory of pdfs works as well (nothing is inferred)
+    '''
+    stack = [(root, {'year': None, 'volume': None, 'issue': None})]
+    while stack:
+        directory, location = stack.pop()
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir():
+                subdirectories.append((entry.path, infer_location(entry.name, location)))
+            elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                stat = entry.stat()
+                yield ScannedFile(entry.path, location['year'], location['volume'],
+                                  location['issue'], stat.st_mtime_ns, stat.st_size)
+        # Popped in name order
+        stack.extend(reversed(subdirectories))
+
+
+class ScanState:
+    '''
+        Signatures (mtime, size) of the files already ingested.
+
+        Attributes:
+            path = Location of the json state file
+            files = {path: [mtime_ns, size]}
+    '''
+
+    def __init__(self, path=SCAN_STATE_PATH):
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.files = json.load(f)
+        except FileNotFoundError:
+            self.files = {}
+
+    def is_changed(self, scanned):
+        return self.files.get(scanned.path) != scanned.signature
+
+    def changed(self, scanned_files):
+        '''Return the files which are new or whose mtime or size changed.'''
+        return [i for i in scanned_files if self.is_changed(i)]
+
+    def update(self, scanned_files):
+        for i in scanned_files:
+            self.files[i.path] = i.signature
+
+    def save(self):
+        atomic.write_atomic(self.path, json.dumps(self.files))
+
+
+def changed_files(root=ARCHIVE_DIR, state=None):
+    '''Return files below root not recorded in state (every file without a state).'''
+    scanned = list(scan_archive(root))
+    return state.changed(scanned) if state is not None else scanned
+
+
+def watch(root=ARCHIVE_DIR, state=None, interval=5.0):
+    '''
+        Poll root forever and yield lists of new or changed files.
+
+        A file is only yielded once its signature is the same on two polls in
+        a row, so a pdf still being copied isn't ingested half written. A file
+        left out of state after it was yielded (eg. failing to parse) isn't
+        yielded again until its signature changes.
+    '''
+    seen = {}
+    # path -> signature of the files yielded by this watch
+    yielded = {}
+    while True:
+        ready = []
+        current = {}
+        for scanned in changed_files(root, state):
+            current[scanned.path] = scanned.signature
+            if (seen.get(scanned.path) == scanned.signature
+                    and yielded.get(scanned.path) != scanned.signature):
+                ready.append(scanned)
+        seen = current
+        if ready:
+            yielded.update((i.path, i.signature) for i in ready)
+            yield ready
+        time.sleep(interval)
@@ -0,0 +1,445 @@
+'''
+    Full-text search over the articles of the archive.
+
+    The index is a directory of immutable segments, each made of:
+        <segment>.docs.json     stored fields of its documents
+        <segment>.terms.json    {term: [offset, count]}
+        <segment>.postings      per term, count document ids then count term
+                                frequencies (uint32, sorted by id), read through mmap
+    and a manifest (index.json) listing the segments, the documents and the
+    deleted ones. Indexing new articles writes a new segment, an article
+    whose content changed deletes its older version; compact() merges every
+    segment into one. Hits are ranked with BM25, matches in the title and
+    authors weigh more than matches in the text.
+
+    Usage:
+        python search.py build ./archives          # index new or changed pdfs
+        python search.py store articles.json       # index titles and authors of the store
+        python search.py query "microfinance poverty"
+        python search.py compact
+'''
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+from array import array
+from collections import Counter
+from typing import NamedTuple
+
+import atomic
+import templates
+
+INDEX_DIR = '.search_index'
+# 2: documents keyed by document_key instead of the pdf filename
+INDEX_VERSION = 2
+MANIFEST = 'index.json'
+
+TOKEN = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it its of on or that the this to was '
+    'were which with'.split())
+# Term frequency of a title or author token counts as many text tokens
+TITLE_WEIGHT = 5
+AUTHORS_WEIGHT = 3
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+POSTING = 'I'
+
+
+class Document(NamedTuple):
+    # Identifies the article across versions, see document_key
+    key: str
+    # Changes with the indexed content, eg. sha256 of the pdf
+    digest: str
+    # Stored and returned with hits: title, authors, volume, issue, pages, href
+    fields: dict
+    text: str
+
+
+class Hit(NamedTuple):
+    score: float
+    key: str
+    fields: dict
+
+
+def tokenize(text):
+    '''Return lower case word tokens of text without stop words.'''
+    return [token for token in TOKEN.findall(text.lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+
+def term_frequencies(document):
+    frequencies = Counter(tokenize(document.text))
+    for token in tokenize(document.fields.get('title') or ''):
+        frequencies[token] += TITLE_WEIGHT
+    for token in tokenize(document.fields.get('authors') or ''):
+        frequencies[token] += AUTHORS_WEIGHT
+    return frequencies
+
+
+def write_json(path, data):
+    atomic.write_atomic(path, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+
+def write_segment(directory, name, documents):
+    '''
+        Write documents as segment name.
+
+        @args:
+            documents: Iterable of (Document, term frequencies) pairs
+
+        @returns:
+            docs (list): Stored fields of the documents, by their id in the segment
+    '''
+    docs = []
+    postings = {}
+    for local_id, (document, frequencies) in enumerate(documents):
+        for term, frequency in frequencies.items():
+            postings.setdefault(term, []).append((local_id, frequency))
+        docs.append(dict(document.fields, key=document.key, digest=document.digest,
+                         length=sum(frequencies.values())))
+
+    terms = {}
+    offset = 0
+    with open(os.path.join(directory, name + '.postings'), 'wb') as f:
+        for term in sorted(postings):
+            # Appended in id order, already sorted
+            entries = postings[term]
+            f.write(array(POSTING, [local_id for local_id, _ in entries]).tobytes())
+            f.write(array(POSTING, [frequency for _, frequency in entries]).tobytes())
+            terms[term] = [offset, len(entries)]
+            offset += 2 * len(entries) * array(POSTING).itemsize
+
+    write_json(os.path.join(directory, name + '.terms.json'), terms)
+    write_json(os.path.join(directory, name + '.docs.json'), docs)
+    return docs
+
+
+class Segment:
+    '''
+        Read only segment, postings are sliced straight out of the mmapped file.
+
+        Attributes:
+            docs = Stored fields by id
+            terms = {term: [offset, count]}
+    '''
+
+    def __init__(self, directory, name):
+        self.name = name
+        with open(os.path.join(directory, name + '.docs.json'), encoding='utf-8') as f:
+            self.docs = json.load(f)
+        with open(os.path.join(directory, name + '.terms.json'), encoding='utf-8') as f:
+            self.terms = json.load(f)
+        self.file = open(os.path.join(directory, name + '.postings'), 'rb')
+        self.data = None
+        if os.fstat(self.file.fileno()).st_size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def postings(self, term):
+        '''Return (document ids, term frequencies) of term or None.'''
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        offset, count = entry
+        size = count * array(POSTING).itemsize
+        view = memoryview(self.data)
+        return (view[offset:offset + size].cast(POSTING),
+                view[offset + size:offset + 2 * size].cast(POSTING))
+
+    def frequencies(self):
+        '''Return term frequencies of every document, by id (used to merge segments).'''
+        documents = [Counter() for _ in self.docs]
+        for term in self.terms:
+            ids, frequencies = self.postings(term)
+            for local_id, frequency in zip(ids, frequencies):
+                documents[local_id][term] = frequency
+        return documents
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+class SearchIndex:
+    '''
+        Segmented inverted index of the articles.
+
+        Usage:
+            with SearchIndex('.search_index') as index:
+                index.add(documents)
+                for hit in index.search('microfinance poverty'):
+                    print(hit.score, hit.fields['title'])
+    '''
+
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'version': INDEX_VERSION, 'byteorder': sys.byteorder,
+                             'next_segment': 1, 'segments': [], 'documents': {},
+                             'deleted': {}, 'total_length': 0}
+        if self.manifest['version'] != INDEX_VERSION:
+            raise Exception(f"Unsupported search index version {self.manifest['version']}, rebuild it.")
+        # Postings are native uint32
+        if self.manifest['byteorder'] != sys.byteorder:
+            raise Exception(f"Search index {directory} was built with another byte order, rebuild it.")
+
+        self.segments = {name: Segment(directory, name) for name in self.manifest['segments']}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.close()
+        self.segments = {}
+
+    def __len__(self):
+        return len(self.manifest['documents'])
+
+    def __contains__(self, key):
+        return key in self.manifest['documents']
+
+    def is_current(self, key, digest):
+        entry = self.manifest['documents'].get(key)
+        return entry is not None and entry[2] == digest
+
+    def _delete(self, key):
+        segment, local_id, _ = self.manifest['documents'].pop(key)
+        self.manifest['deleted'].setdefault(segment, []).append(local_id)
+        self.manifest['total_length'] -= self.segments[segment].docs[local_id]['length']
+
+    def add(self, documents, replace=True):
+        '''
+            Index documents in a new segment.
+
+            @args:
+                replace: Replace indexed documents whose digest changed, else
+                    documents already indexed under their key are skipped
+
+            @returns:
+                added (int): Number of documents indexed
+        '''
+        pending = {}
+        for document in documents:
+            if self.is_current(document.key, document.digest):
+                continue
+            if document.key in self and not replace:
+                continue
+            pending[document.key] = document
+        if not pending:
+            return 0
+
+        name = f"segment-{self.manifest['next_segment']:06d}"
+        docs = write_segment(self.directory, name,
+                             ((document, term_frequencies(document)) for document in pending.values()))
+        self._register(name, docs)
+        return len(docs)
+
+    def _register(self, name, docs):
+        '''Add the written segment name to the manifest and save it.'''
+        self.segments[name] = Segment(self.directory, name)
+        self.manifest['next_segment'] += 1
+        self.manifest['segments'].append(name)
+        for local_id, doc in enumerate(docs):
+            if doc['key'] in self:
+                self._delete(doc['key'])
+            self.manifest['documents'][doc['key']] = [name, local_id, doc['digest']]
+            self.manifest['total_length'] += doc['length']
+        self.save()
+
+    def save(self):
+        write_json(os.path.join(self.directory, MANIFEST), self.manifest)
+
+    def search(self, query, limit=10):
+        '''
+            Return the best limit Hit of query, any of its terms matches.
+
+            Scores are BM25 over the live documents of every segment.
+        '''
+        count = len(self)
+        if not count:
+            return []
+        average_length = self.manifest['total_length'] / count or 1
+        deleted = {name: set(ids) for name, ids in self.manifest['deleted'].items()}
+
+        scores = Counter()
+        for term in set(tokenize(query)):
+            matches = []
+            for name, segment in self.segments.items():
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                dead = deleted.get(name, ())
+                matches.extend((segment, local_id, frequency)
+                               for local_id, frequency in zip(*postings) if local_id not in dead)
+            if not matches:
+                continue
+
+            idf = math.log(1 + (count - len(matches) + .5) / (len(matches) + .5))
+            for segment, local_id, frequency in matches:
+                length = segment.docs[local_id]['length']
+                scores[segment.name, local_id] += idf * frequency * (K1 + 1) / (
+                    frequency + K1 * (1 - B + B * length / average_length))
+
+        hits = []
+        for (name, local_id), score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            doc = self.segments[name].docs[local_id]
+            hits.append(Hit(score, doc['key'], doc))
+        return hits
+
+    def compact(self):
+        '''Merge every segment into a single one without the deleted documents.'''
+        if len(self.segments) < 2 and not any(self.manifest['deleted'].values()):
+            return
+
+        def live_documents():
+            for name in self.manifest['segments']:
+                segment = self.segments[name]
+                dead = set(self.manifest['deleted'].get(name, ()))
+                for local_id, frequencies in enumerate(segment.frequencies()):
+                    if local_id not in dead:
+                        doc = dict(segment.docs[local_id])
+                        key, digest = doc.pop('key'), doc.pop('digest')
+                        del doc['length']
+                        yield Document(key, digest, doc, ''), frequencies
+
+        name = f"segment-{self.manifest['next_segment']:06d}"
+        docs = write_segment(self.directory, name, live_documents())
+
+        old = self.manifest['segments']
+        self.close()
+        self.manifest.update(segments=[], documents={}, deleted={}, total_length=0)
+        self._register(name, docs)
+        for previous in old:
+            for suffix in ('.docs.json', '.terms.json', '.postings'):
+                os.remove(os.path.join(self.directory, previous + suffix))
+
+
+def document_key(volume, issue, filename, section=None):
+    '''
+        Return key of the article of filename in volume and issue, the same
+        basename may be used by articles of different issues.
+
+        Example: document_key(5, '2', 'paper.pdf') -> '5/2/paper.pdf', articles
+        without volume (eg. Special Editions) are keyed by their section header
+    '''
+    if volume is None:
+        return f'{section or ""}/{filename}'
+    return f'{int(volume)}/{int(issue)}/{filename}'
+
+
+def document_from_fields(path, fields, digest=None):
+    '''Return Document of the fields of pdf.article_fields/pdf.ingest for the file at path.'''
+    if digest is None:
+        import cache
+        digest = cache.file_digest(path)
+    href = None
+    if fields.get('volume'):
+        href = templates.article_href(fields['year'], fields['volume'], fields['issue'], fields['filename'])
+    key = document_key(fields['volume'], fields['issue'], fields['filename'])
+    return Document(key, digest, {
+        'title': fields['title'],
+        'authors': fields['authors'],
+        'volume': fields['volume'],
+        'issue': fields['issue'],
+        'pages': fields['page_range'],
+        'href': href,
+    }, fields.get('text') or '')
+
+
+def documents_from_store(records):
+    '''Return Document (title and authors only) of the records of the metadata store (see build.py).'''
+    for record in records:
+        if not record.get('filename'):
+            continue
+        fields = {name: record.get(name) for name in ('title', 'authors', 'volume', 'issue', 'pages', 'href')}
+        digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+        key = document_key(record.get('volume'), record.get('issue'), record['filename'], record.get('section'))
+        yield Document(key, 'store:' + digest, fields, '')
+
+
+def index_directory(index, directory, workers=None, metadata_cache=None, pages=None):
+    '''
+        Index the pdfs below directory which are new or changed since the last build.
+
+        @returns:
+            (added, failed): Number of documents indexed and of files failing to parse
+    '''
+    import pdf
+    import scanner
+
+    state = scanner.ScanState(os.path.join(index.directory, 'scan_state.json'))
+    batch = scanner.changed_files(directory, state)
+    hints = {i.path: i.vol_issue for i in batch}
+    documents = []
+    indexed = set()
+    failed = 0
+    for path, fields, error in pdf.ingest([i.path for i in batch], workers=workers,
+                                          metadata_cache=metadata_cache, pages=pages, hints=hints,
+                                          fields=pdf.TABLE_FIELDS + ('text',)):
+        if error is not None:
+            print(f"{path}: {error}")
+            failed += 1
+            continue
+        documents.append(document_from_fields(path, fields))
+        indexed.add(path)
+
+    added = index.add(documents)
+    # Failed files are left out of the state so that the next build retries them
+    state.update(i for i in batch if i.path in indexed)
+    state.save()
+    return added, failed
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Build and query the full-text index of the articles.')
+    arg_parser.add_argument('--index', default=INDEX_DIR, help='index directory')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='index new or changed pdfs of a directory tree')
+    build_parser.add_argument('directory', nargs='?', default='archives')
+    build_parser.add_argument('-w', '--workers', type=int, default=None)
+    build_parser.add_argument('-p', '--pages', type=int, default=None,
+                              help='index only the first N pages (pdftohtml instead of Tika)')
+    build_parser.add_argument('--cache', default='.gjms_cache', help='metadata cache directory')
+
+    store_parser = commands.add_parser('store', help='index titles and authors of the metadata store')
+    store_parser.add_argument('store', nargs='?', default='articles.json')
+
+    query_parser = commands.add_parser('query', help='print the best matching articles')
+    query_parser.add_argument('query')
+    query_parser.add_argument('-n', '--limit', type=int, default=10)
+
+    commands.add_parser('compact', help='merge all segments into one')
+    args = arg_parser.parse_args()
+
+    with SearchIndex(args.index) as index:
+        if args.command == 'build':
+            import cache
+            added, failed = index_directory(index, args.directory, args.workers,
+                                            cache.MetadataCache(args.cache), args.pages)
+            print(f"{added} articles indexed, {failed} failed, {len(index)} in the index")
+        elif args.command == 'store':
+            import build
+            added = index.add(documents_from_store(build.load_store(args.store)), replace=False)
+            print(f"{added} articles indexed, {len(index)} in the index")
+        elif args.command == 'query':
+            for hit in index.search(args.query, args.limit):
+                print(f"{hit.score:6.2f}  {hit.fields['title']} - {hit.fields['authors']}  {hit.fields['href'] or ''}")
+        else:
+            index.compact()
+            print(f"{len(index)} articles in {len(index.segments)} segment(s)")
@@ -0,0 +1,117 @@
+'''
+    Html of the archive page tables.
+
+    Rows and sections are written with f-strings, every value is html
+    escaped. write_issue/write_archive stream the output piece by piece
+    instead of building the whole page in memory.
+'''
+from html import escape
+
+ARCHIVE_ROOT = 'http://gjmsweb.com/archives/'
+
+
+def row_html(values):
+    '''Return html of a table row from the values of row_values.'''
+    return f'''
+        <tr>
+        <td>{escape(str(values['number']))}</td>
+        <td>{escape(str(values['note']))}</td>
+        <td>{escape(str(values['pages']))}</td>
+        <td><a href="{escape(str(values['href']))}">PDF</a></td>
+        </tr>
+        '''
+
+
+def section_head(header):
+    '''Return html of an issue section up to its first row.'''
+    return f'''<div class="col-lg-12">
+    <blockquote>{escape(str(header))}</blockquote>
+  <details>
+    <table class="table table-bordered">
+      <div class="row">
+        <div class="container">
+          <div class="col-lg-12">
+            <table class="table table-bordered">
+              <thead>
+                <tr>
+                  <th>#</th>
+                  <th>Editor&rsquo;s Note</th>
+                  <th>Page #</th>
+                  <th>Read</th>
+                </tr>
+              </thead>
+              <tbody>'''
+
+
+def section_tail(header):
+    '''Return html of an issue section after its last row.'''
+    return f'''
+              </tbody>
+              </table>
+              <strong>{escape(str(header))}</strong>
+              </div>
+              </div>
+              </div>
+              </table>
+              </details>
+              <hr>
+    </div>'''
+
+
+def section_html(header, rows=''):
+    '''Return html of an issue section, rows are inserted as is (already rendered).'''
+    return section_head(header) + rows + section_tail(header)
+
+
+def article_href(year, volume, issue, filename):
+    '''Return link of an article pdf in the archive directory tree.'''
+    return f'{ARCHIVE_ROOT}{year}/Volume {volume}/Issue {issue}, {year}/{filename}'
+
+
+def row_values(number, title, authors, pages, href):
+    '''Return values of row_html, the note cell reads "title - authors".'''
+    return {
+        'number': number,
+        'note': f'{title} - {authors}' if authors else title,
+        'pages': pages,
+        'href': href,
+    }
+
+
+def render_row(number, title, authors, pages, href):
+    return row_html(row_values(number, title, authors, pages, href))
+
+
+def write_issue(write, header, rows):
+    '''
+        Render section of one issue with all of its rows.
+
+        @args:
+            write: Callable receiving the output, eg. file.write
+            header: Issue header, eg. Vol 4 - No. 2 (Apr - Jun, 2018)
+            rows: Iterable of mappings with number, note, pages and href (see row_values)
+    '''
+    write(section_head(header))
+    for row in rows:
+        write(row_html(row))
+    write(section_tail(header))
+
+
+def write_archive(out, issues, separator='\n'):
+    '''
+        Render the listing of every issue in a single pass straight to out.
+
+        @args:
+            out: File like object (file, io.StringIO, socket.makefile('w'), ...)
+            issues: Iterable of (header, rows) pairs in page order
+    '''
+    write = out.write
+    for header, rows in issues:
+        write_issue(write, header, rows)
+        write(separator)
+
+
+def render_issue(header, rows):
+    buffer = []
+    write_issue(buffer.append, header, rows)
+    return ''.join(buffer)
@@ -1,6 +1,6 @@
 import bs4
 
-f = open('archive.php', 'r')
+f = open('archives.php', 'r')
 soup = bs4.BeautifulSoup(f.read(), 'lxml')
 
 def get_last_volume():
@@ -18,5 +18,5 @@ def get_last_volume():
     # if ":
     #     print(i)
 # print(soup.prettify())
-get_last_column()
+print(get_last_volume())
 f.close()
@@ -3,6 +3,8 @@ import os
 from bs4 import BeautifulSoup
 from tika import tika
 
+import templates
+
 
 def create_soup(fn):
     return BeautifulSoup(fn, 'lxml')
@@ -10,33 +12,9 @@ def create_soup(fn):
 def get_last_volume(soup_object):
     return soup_object.findAll('div', class_="container")[-1]
 
-def get_template(blockquote):
-    return f'''<div class="col-lg-12">
-    <blockquote>{blockquote}</blockquote>
-  <details>
-    <table class="table table-bordered">
-      <div class="row">
-        <div class="container">
-          <div class="col-lg-12">
-            <table class="table table-bordered">
-              <thead>
-                <tr>
-                  <th>#</th>
-                  <th>Editor&rsquo;s Note</th>
-                  <th>Page #</th>
-                  <th>Read</th>
-                </tr>
-              </thead>
-              <tbody>
-              </tbody>
-              </table>
-              <strong>{blockquote}</strong>
-              </div>
-              </div>
-              </div>
-              </table>
-              </details>
-    '''
+def get_template(blockquote, rows=''):
+    '''Return html section of an issue, rows are inserted as is (already rendered).'''
+    return templates.section_html(blockquote, rows)
 
 
 def config_tika(tika_jar_path=__file__):